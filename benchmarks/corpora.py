@@ -0,0 +1,282 @@
+"""
+Synthetic stand-ins for the upstreams the benchmarked commands download, laid out
+by host and path under a directory so that https://<host>/<path> can be served as
+http://127.0.0.1:<port>/<host>/<path>. Generated from a fixed seed, so the same
+scale always gives the same bytes.
+"""
+
+import io
+import json
+import random
+import tarfile
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+
+vocabulary = """
+the a of to and in is it for that on with as by this be are from or an at not
+value array object function return type string number element node event method
+property instance default option buffer stream request response module import
+class error index length parse convert render callback promise async await key
+"""
+words = vocabulary.split()
+
+
+@dataclass
+class Corpus:
+    # Bytes and pages (files, api entries, ...) the command reads, for throughput
+    n_bytes: int
+    pages: int
+
+
+def sentence(rng: random.Random, n_words: int) -> str:
+    return " ".join(rng.choice(words) for _ in range(n_words)).capitalize() + "."
+
+
+def paragraph(rng: random.Random) -> str:
+    return " ".join(sentence(rng, rng.randint(6, 20)) for _ in range(rng.randint(2, 6)))
+
+
+def code(rng: random.Random) -> str:
+    return "\n".join(
+        f"const {rng.choice(words)}{i} = {rng.choice(words)}({rng.randint(0, 99)});"
+        for i in range(rng.randint(2, 8))
+    )
+
+
+def html_section(rng: random.Random, title: str, extra="") -> str:
+    parts = [f'<h2 id="{title}">{title}</h2>']
+    for _ in range(rng.randint(2, 5)):
+        parts.append(f"<p>{paragraph(rng)} <strong>{rng.choice(words)}</strong></p>")
+        if rng.random() < 0.4:
+            parts.append(f'<pre><code class="language-js">{code(rng)}</code></pre>')
+        if rng.random() < 0.3:
+            parts.append(f'<p>See <a href="#{title}">{title}</a>.</p>')
+    return "\n".join(parts) + extra
+
+
+def write_tgz(dest: Path, files: dict[str, bytes]):
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    with tarfile.open(dest, "w:gz") as tar:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = 0
+            tar.addfile(info, io.BytesIO(data))
+
+
+def write_zip(dest: Path, files: dict[str, bytes]):
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    with zipfile.ZipFile(dest, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in files.items():
+            zf.writestr(zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0)), data)
+
+
+def devdocs_dom(root: Path, scale: float) -> Corpus:
+    """A devdocs.io tarball of the dom set, with the parts its rules drop."""
+    rng = random.Random(1)
+    files = {"meta.json": json.dumps({"release": "2025"}).encode()}
+    for i in range(int(1500 * scale)):
+        title = f"{rng.choice(words)}_{i}"
+        page = [
+            f"<h1>{title}</h1>",
+            '<details class="baseline-indicator">Baseline widely available</details>',
+        ]
+        if i % 20 == 0:
+            page.append('<div class="notecard deprecated">Deprecated</div>')
+        if rng.random() < 0.2:
+            page.append('<div class="experimental">Experimental</div>')
+        for j in range(rng.randint(1, 4)):
+            page.append(html_section(rng, f"{title}_{j}"))
+        page.append('<h2 id="specifications">Specifications</h2>')
+        page.append('<div class="_table"><table><tr><td>spec</td></tr></table></div>')
+        page.append('<h2 id="see_also">See also</h2>')
+        page.append(f'<div class="section-content"><p>{sentence(rng, 8)}</p></div>')
+        page.append('<div class="_attribution">MDN contributors</div>')
+        files[f"{title}.html"] = "\n".join(page).encode()
+    write_tgz(root / "downloads.devdocs.io" / "dom.tar.gz", files)
+    return Corpus(sum(len(d) for d in files.values()), len(files) - 1)
+
+
+def nodejs_all_html(root: Path, scale: float) -> Corpus:
+    """The single page with every Node.js api."""
+    rng = random.Random(2)
+    sections = []
+    n_sections = int(3000 * scale)
+    for i in range(n_sections):
+        sections.append(
+            html_section(
+                rng,
+                f"{rng.choice(words)}_{i}",
+                extra=(
+                    '<button class="copy-button">copy</button>'
+                    f'<pre><code class="language-js cjs">{code(rng)}</code></pre>'
+                ),
+            )
+        )
+    page = (
+        "<html><head><title>Node.js</title></head><body>"
+        '<div id="toc">toc</div><div id="apicontent">'
+        + "\n".join(sections)
+        + "</div></body></html>"
+    ).encode()
+    dest = root / "nodejs.org" / "docs" / "latest-v24.x" / "api" / "all.html"
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    dest.write_bytes(page)
+    return Corpus(len(page), n_sections)
+
+
+def p5js_data_json(root: Path, scale: float) -> Corpus:
+    """p5.js reference data, nested dicts of html descriptions."""
+    rng = random.Random(3)
+    n_items = int(3000 * scale)
+    data = {
+        "project": {"version": "1.11.0", "name": "p5"},
+        "classes": {
+            f"p5.{rng.choice(words).capitalize()}{i}": {
+                "description": f"<p>{paragraph(rng)}</p>",
+                "file": "src/core.js",
+                "line": i,
+            }
+            for i in range(n_items // 10)
+        },
+        "classitems": [
+            {
+                "name": f"{rng.choice(words)}{i}",
+                "description": f"<p>{paragraph(rng)}</p>\\n<p>{paragraph(rng)}</p>",
+                "params": [
+                    {"name": rng.choice(words), "description": sentence(rng, 8)}
+                    for _ in range(rng.randint(0, 3))
+                ],
+                "itemtype": "method",
+                "file": "src/core.js",
+                "line": i,
+            }
+            for i in range(n_items)
+        ],
+    }
+    body = json.dumps(data).encode()
+    dest = root / "p5js.org" / "reference" / "data.json"
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    dest.write_bytes(body)
+    return Corpus(len(body), n_items + n_items // 10)
+
+
+def python_docs_text(root: Path, scale: float) -> Corpus:
+    """The python.org ftp listing and a docs-text zip of rst-like txts."""
+    rng = random.Random(4)
+    ftp = root / "www.python.org" / "ftp" / "python"
+    ftp.mkdir(parents=True, exist_ok=True)
+    (ftp / "index.html").write_text(
+        "".join(f'<a href="3.13.{patch}/">3.13.{patch}/</a>\n' for patch in range(6))
+    )
+    files = {}
+    for i in range(int(1500 * scale)):
+        title = f"{rng.choice(words)}{i} --- {sentence(rng, 4)}"
+        text = [title, "*" * len(title), ""]
+        for _ in range(rng.randint(3, 12)):
+            heading = sentence(rng, 3)
+            text += [heading, "=" * len(heading), "", paragraph(rng), ""]
+            if rng.random() < 0.5:
+                text += ["   " + line for line in code(rng).splitlines()] + [""]
+        files[f"python-3.13.5-docs-text/library/{rng.choice(words)}{i}.txt"] = (
+            "\n".join(text).encode()
+        )
+    files["python-3.13.5-docs-text/library/tkinter.txt"] = b"excluded"
+    files["python-3.13.5-docs-text/tutorial/index.txt"] = b"not collected"
+    write_zip(
+        ftp / "doc" / "3.13.5" / "python-3.13.5-docs-text.zip",
+        files,
+    )
+    return Corpus(sum(len(d) for d in files.values()), len(files))
+
+
+def uv_source(root: Path, scale: float) -> Corpus:
+    """A github release tarball of markdown docs, for collect_tgz."""
+    rng = random.Random(5)
+    files = {}
+    for i in range(int(2000 * scale)):
+        text = [f"# {sentence(rng, 4)}", ""]
+        for _ in range(rng.randint(2, 8)):
+            text += [f"## {sentence(rng, 3)}", "", paragraph(rng), ""]
+            if rng.random() < 0.4:
+                text += ["```console", code(rng), "```", ""]
+        section = rng.choice(["concepts", "guides", "reference", "pip"])
+        files[f"uv-0.9.0/docs/{section}/{rng.choice(words)}{i}.md"] = "\n".join(
+            text
+        ).encode()
+    files["uv-0.9.0/docs/reference/cli.md"] = b"excluded"
+    files["uv-0.9.0/crates/uv/src/lib.rs"] = b"not collected"
+    write_tgz(
+        root
+        / "github.com"
+        / "astral-sh"
+        / "uv"
+        / "archive"
+        / "refs"
+        / "tags"
+        / "0.9.0.tar.gz",
+        files,
+    )
+    return Corpus(sum(len(d) for d in files.values()), len(files))
+
+
+def zarr_sphinx(root: Path, scale: float) -> Corpus:
+    """A github tarball of rst user guide pages and a readthedocs sphinx htmlzip."""
+    rng = random.Random(6)
+    files = {}
+    for i in range(int(60 * scale)):
+        heading = sentence(rng, 3)
+        files[f"zarr-3.1.0/docs/user-guide/{rng.choice(words)}{i}.rst"] = "\n".join(
+            [heading, "=" * len(heading), "", paragraph(rng), ""]
+        ).encode()
+    write_tgz(
+        root
+        / "github.com"
+        / "zarr-developers"
+        / "zarr"
+        / "archive"
+        / "refs"
+        / "tags"
+        / "v3.1.0.tar.gz",
+        files,
+    )
+
+    n_sections = int(2000 * scale)
+    page = (
+        '<html><body><div class="sphinxsidebar">nav</div><div class="body">'
+        + "\n".join(
+            html_section(rng, f"zarr.{rng.choice(words)}{i}") for i in range(n_sections)
+        )
+        + "</div></body></html>"
+    ).encode()
+    htmlzip = {"zarr-v3.1.0/index.html": page, "zarr-v3.1.0/_static/x.css": b""}
+    # Named index.html so the trailing slash url readthedocs uses is served with it
+    write_zip(
+        root
+        / "zarr.readthedocs.io"
+        / "_"
+        / "downloads"
+        / "en"
+        / "v3.1.0"
+        / "htmlzip"
+        / "index.html",
+        htmlzip,
+    )
+    return Corpus(
+        sum(len(d) for d in files.values()) + len(page), len(files) + n_sections
+    )
+
+
+# github ids whose latest release the local server redirects to, like github does
+latest_releases = {"astral-sh/uv": "0.9.0"}
+
+# Generators by the name of the corpus
+generators = {
+    "devdocs-dom": devdocs_dom,
+    "nodejs": nodejs_all_html,
+    "p5js": p5js_data_json,
+    "python": python_docs_text,
+    "uv": uv_source,
+    "zarr": zarr_sphinx,
+}
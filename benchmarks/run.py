@@ -0,0 +1,247 @@
+"""
+Offline benchmarks of whole pipelines. Synthetic upstreams from corpora.py are
+served on a local http server, every upstream url is rewritten to it, and each
+command is run end to end in a fresh workspace, so the numbers don't depend on
+the network or on what upstream happens to publish.
+
+    uv run python benchmarks/run.py run --repeat 3
+    uv run python benchmarks/run.py run --only nodejs,p5js --scale 4 --profile
+
+Each benchmark runs lt in its own process, peak memory is that process's max RSS
+(process pool workers of --per-page aren't included). build-site runs last, over
+the txts the others wrote.
+"""
+
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import click
+import corpora
+
+
+@dataclass
+class Benchmark:
+    name: str
+    # Corpus the command reads, None for build-site which reads the txts
+    corpus: str | None
+    args: list[str]
+
+
+@dataclass
+class Result:
+    name: str
+    args: list[str]
+    input_bytes: int
+    pages: int
+    seconds: list[float]
+    median_seconds: float
+    mb_per_s: float
+    pages_per_s: float
+    peak_rss_bytes: int
+
+
+benchmarks = [
+    Benchmark("devdocs dom", "devdocs-dom", ["dom"]),
+    Benchmark("devdocs dom --per-page", "devdocs-dom", ["dom", "--per-page"]),
+    Benchmark("devdocs dom --stream", "devdocs-dom", ["dom", "--stream"]),
+    Benchmark("nodejs", "nodejs", ["nodejs", "24"]),
+    Benchmark("p5js", "p5js", ["p5js"]),
+    Benchmark("python", "python", ["python", "3.13"]),
+    Benchmark("collect (uv)", "uv", ["uv"]),
+    Benchmark("zarr sphinx htmlzip", "zarr", ["zarr", "--version", "3.1.0"]),
+    Benchmark("build-site", None, ["build-site"]),
+]
+
+
+class Handler(SimpleHTTPRequestHandler):
+    """Serves the corpus directory, and github's latest release redirects."""
+
+    def do_GET(self):
+        for gh_id, tag in corpora.latest_releases.items():
+            if self.path == f"/github.com/{gh_id}/releases/latest":
+                self.send_response(302)
+                self.send_header(
+                    "Location", f"https://github.com/{gh_id}/releases/tag/{tag}"
+                )
+                self.end_headers()
+                return
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(corpus_dir: Path) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0), partial(Handler, directory=str(corpus_dir))
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_lt(workspace: Path, port: int, args: list[str]) -> tuple[float, int]:
+    """Run lt in workspace against the local server, give back seconds and max RSS."""
+    log_p = workspace / "lt.log"
+    with log_p.open("a") as log:
+        start = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, __file__, "lt", "--port", str(port), *args],
+            cwd=workspace,
+            stdout=log,
+            stderr=log,
+        )
+        _, status, rusage = os.wait4(proc.pid, 0)
+        seconds = time.perf_counter() - start
+    if os.waitstatus_to_exitcode(status) != 0:
+        tail = "".join(log_p.read_text().splitlines(keepends=True)[-20:])
+        raise click.ClickException(f"lt {' '.join(args)} failed:\n{tail}")
+    # ru_maxrss is in KiB on linux
+    return seconds, rusage.ru_maxrss * 1024
+
+
+def txts_size(workspace: Path) -> tuple[int, int]:
+    txt_ps = [p for p in (workspace / "site-build" / "txts").iterdir() if p.is_file()]
+    return sum(p.stat().st_size for p in txt_ps), len(txt_ps)
+
+
+@click.group
+def cli():
+    pass
+
+
+@cli.command
+@click.option("--scale", type=float, default=1.0, show_default=True)
+@click.option("--repeat", type=int, default=3, show_default=True)
+@click.option("--only", help="Comma separated benchmark names to run.")
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Run lt with --profile, its reports are kept in the work directory.",
+)
+@click.option(
+    "--workdir",
+    type=click.Path(path_type=Path),
+    help="Where corpora and workspaces go, a temporary directory by default.",
+)
+@click.option("--json", "json_p", type=click.Path(path_type=Path))
+def run(
+    scale: float,
+    repeat: int,
+    only: str | None,
+    profile: bool,
+    workdir: Path | None,
+    json_p: Path | None,
+):
+    """Run the benchmarks and print a table of the results."""
+    selected = benchmarks
+    if only is not None:
+        names = [name.strip() for name in only.split(",")]
+        selected = [b for b in benchmarks if any(b.name.startswith(n) for n in names)]
+
+    is_tmp = workdir is None
+    if workdir is None:
+        workdir = Path(tempfile.mkdtemp(prefix="lt-bench-"))
+    corpus_dir = workdir / "corpus"
+    if corpus_dir.exists():
+        shutil.rmtree(corpus_dir)
+    corpus_dir.mkdir(parents=True)
+    sizes = {}
+    for b in selected:
+        if b.corpus is not None and b.corpus not in sizes:
+            click.echo(f"Generating {b.corpus} corpus", err=True)
+            sizes[b.corpus] = corpora.generators[b.corpus](corpus_dir, scale)
+
+    server = serve(corpus_dir)
+    port = server.server_address[1]
+    runs: dict[str, list[tuple[float, int]]] = {b.name: [] for b in selected}
+    built: dict[str, tuple[int, int]] = {}
+    try:
+        for i in range(repeat):
+            # Fresh every time, so every run downloads and builds from scratch
+            workspace = workdir / f"workspace-{i}"
+            if workspace.exists():
+                shutil.rmtree(workspace)
+            (workspace / ".git").mkdir(parents=True)
+            for b in selected:
+                click.echo(f"[{i + 1}/{repeat}] {b.name}", err=True)
+                args = ["--profile", *b.args] if profile else b.args
+                args = ["--force", *args]
+                if b.corpus is None:
+                    built[b.name] = txts_size(workspace)
+                runs[b.name].append(run_lt(workspace, port, args))
+    finally:
+        server.shutdown()
+
+    results = []
+    for b in selected:
+        if b.corpus is None:
+            n_bytes, pages = built[b.name]
+        else:
+            n_bytes, pages = sizes[b.corpus].n_bytes, sizes[b.corpus].pages
+        seconds = [s for s, _ in runs[b.name]]
+        median = statistics.median(seconds)
+        results.append(
+            Result(
+                name=b.name,
+                args=b.args,
+                input_bytes=n_bytes,
+                pages=pages,
+                seconds=seconds,
+                median_seconds=median,
+                mb_per_s=n_bytes / 1e6 / median,
+                pages_per_s=pages / median,
+                peak_rss_bytes=max(rss for _, rss in runs[b.name]),
+            )
+        )
+
+    click.echo(
+        f"{'benchmark':<24}{'input MB':>10}{'pages':>8}{'median s':>10}"
+        f"{'MB/s':>8}{'pages/s':>10}{'peak MB':>9}"
+    )
+    for r in results:
+        click.echo(
+            f"{r.name:<24}{r.input_bytes / 1e6:>10.1f}{r.pages:>8}"
+            f"{r.median_seconds:>10.2f}{r.mb_per_s:>8.2f}"
+            f"{r.pages_per_s:>10.1f}{r.peak_rss_bytes / 1e6:>9.0f}"
+        )
+    if json_p is not None:
+        json_p.write_text(
+            json.dumps(
+                {"scale": scale, "results": [vars(r) for r in results]}, indent=2
+            )
+        )
+    if profile:
+        click.echo(f"Profiles are in {workdir}/workspace-*/scratchspace/profiles")
+    elif is_tmp:
+        shutil.rmtree(workdir)
+
+
+@cli.command(
+    hidden=True,
+    context_settings={"ignore_unknown_options": True},
+    add_help_option=False,
+)
+@click.option("--port", type=int, required=True)
+@click.argument("args", nargs=-1, type=click.UNPROCESSED)
+def lt(port: int, args: tuple[str, ...]):
+    """lt, with upstream urls going to the local server."""
+    from llm_txts import cli as lt_cli
+    from llm_txts.httpcache import url_rewrites
+
+    url_rewrites["https://"] = f"http://127.0.0.1:{port}/"
+    lt_cli.main(list(args), prog_name="lt")
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,29 +1,4 @@
-# ruff: noqa F401
-# If the subcommand's module is not imported it will not attach itself to the cli click.group
-from . import (
-    beautifulsoup,
-    boto3,
-    commanderjs,
-    devdocs,
-    hy,
-    icechunk,
-    mlx,
-    networkx,
-    nodejs,
-    p5js,
-    progit,
-    puppeteer,
-    python,
-    ruff,
-    ty,
-    typst,
-    uv,
-    whenever,
-    xarray,
-    zarr,
-    zig,
-    zed,
-)
+# Subcommands are imported by the cli group when they're run, see lazy_commands
 from .cli import cli
 
 __all__ = ["cli"]
@@ -1,24 +1,26 @@
 import logging
 
 import click
-import httpx
 
+from .builds import Build
 from .cli import cli
-from .license_info import license_info
-
-license_info["beautifulsoup"] = "MIT License"
+from .profiling import stage
 
 
 @click.command
 @click.pass_context
 def beautifulsoup(ctx):
+    build = Build(ctx, "latest")
     txt_dest = ctx.obj["txts"] / "beautifulsoup-latest.txt"
     logging.info("Downloading documentation website rst source to txt")
-    resp = httpx.get(
+    resp = build.fetch(
         "https://www.crummy.com/software/BeautifulSoup/bs4/doc/_sources/index.rst.txt"
     )
-    with txt_dest.open(mode="a") as f:
-        f.write(resp.text)
+    if build.is_fresh():
+        return
+    with stage(ctx, "write"), txt_dest.open(mode="w") as f:
+        f.write(resp.read_text())
+    build.done(txt_dest)
     logging.info("Done with beautifulsoup")
 
 
@@ -0,0 +1,160 @@
+"""
+Content addressed store under scratchspace, keyed by sha256. Downloaded bodies and
+the files extracted out of them are stored once no matter how many versions, runs
+or urls they come from, and working trees and copied txts are materialized from it
+as reflinks where the filesystem supports them and hardlinks otherwise.
+
+A hardlink shares its content with the blob, so a materialized path must never be
+written to in place: unlink it first and write a new file, like materialize does.
+Blobs are made read-only to catch that.
+
+Blobs that nothing uses anymore are removed by collect_garbage, which build-all
+runs at the end.
+"""
+
+import contextlib
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+from collections.abc import Iterable
+from pathlib import Path
+from typing import IO
+
+from . import workspace
+
+# Size of the chunks blobs are read and written in
+CHUNK_SIZE = 1024 * 1024
+
+# linux's ioctl that makes a file share another's extents, i.e. a reflink
+FICLONE = 0x40049409
+
+# Filesystems (st_dev) that turned out not to support reflinks
+no_reflink_devs: set[int] = set()
+
+
+def blobs_dir() -> Path:
+    return workspace.scratchspace / "blobs"
+
+
+def blob_path(sha256: str) -> Path:
+    return blobs_dir() / sha256[:2] / sha256[2:]
+
+
+def file_sha256(p: Path) -> str:
+    with p.open("rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def add_file(p: Path, sha256: str | None = None) -> str:
+    """
+    Move p into the store, giving back its sha256. Pass sha256 if it's already
+    known. If the blob is already stored p is just removed.
+    """
+    if sha256 is None:
+        sha256 = file_sha256(p)
+    blob_p = blob_path(sha256)
+    if blob_p.exists():
+        p.unlink()
+    else:
+        blob_p.parent.mkdir(parents=True, exist_ok=True)
+        p.chmod(0o444)
+        os.replace(p, blob_p)
+    return sha256
+
+
+def put_chunks(chunks: Iterable[bytes]) -> str:
+    """Store the concatenation of chunks, giving back its sha256."""
+    blobs_dir().mkdir(parents=True, exist_ok=True)
+    hasher = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(dir=blobs_dir(), delete=False) as f:
+        tmp_p = Path(f.name)
+        try:
+            for chunk in chunks:
+                hasher.update(chunk)
+                f.write(chunk)
+        except BaseException:
+            f.close()
+            tmp_p.unlink()
+            raise
+    return add_file(tmp_p, hasher.hexdigest())
+
+
+def put_stream(f: IO[bytes], size: int | None = None) -> str:
+    """
+    Store what's left to read in f. Reads of at most CHUNK_SIZE known bytes are
+    hashed in memory first, so content that's already stored isn't written again.
+    """
+    if size is not None and size <= CHUNK_SIZE:
+        data = f.read()
+        sha256 = hashlib.sha256(data).hexdigest()
+        if blob_path(sha256).exists():
+            return sha256
+        return put_chunks([data])
+    return put_chunks(iter(lambda: f.read(CHUNK_SIZE), b""))
+
+
+def reflink(src: Path, dest: Path) -> bool:
+    if sys.platform != "linux":
+        return False
+    import fcntl
+
+    dev = src.stat().st_dev
+    if dev in no_reflink_devs:
+        return False
+    try:
+        with src.open("rb") as src_f, dest.open("wb") as dest_f:
+            fcntl.ioctl(dest_f.fileno(), FICLONE, src_f.fileno())
+    except OSError:
+        dest.unlink(missing_ok=True)
+        no_reflink_devs.add(dev)
+        return False
+    return True
+
+
+def materialize(sha256: str, dest: Path):
+    """Make dest a file with the blob's content, replacing whatever is at dest."""
+    blob_p = blob_path(sha256)
+    dest.unlink(missing_ok=True)
+    if reflink(blob_p, dest):
+        return
+    try:
+        os.link(blob_p, dest)
+    except OSError:
+        # e.g. dest is on another filesystem
+        shutil.copyfile(blob_p, dest)
+
+
+def copy(src: Path, dest: Path):
+    """Like shutil.copyfile, but src is stored and dest materialized from it."""
+    with src.open("rb") as f:
+        sha256 = put_stream(f, src.stat().st_size)
+    materialize(sha256, dest)
+
+
+def collect_garbage(keep: set[str]) -> tuple[int, int]:
+    """
+    Remove the blobs that aren't in keep, e.g. the bodies the http cache points
+    to, and that no materialized file is hardlinked to anymore. Gives back how
+    many were removed and their total size. Only run it when nothing is adding to
+    the store, a blob that was just added isn't materialized yet.
+    """
+    removed = freed = 0
+    if not blobs_dir().exists():
+        return removed, freed
+    for prefix_dir in blobs_dir().iterdir():
+        if not prefix_dir.is_dir():
+            # Left by an interrupted put_chunks
+            prefix_dir.unlink()
+            continue
+        for blob_p in prefix_dir.iterdir():
+            st = blob_p.stat()
+            if st.st_nlink > 1 or prefix_dir.name + blob_p.name in keep:
+                continue
+            blob_p.unlink()
+            removed += 1
+            freed += st.st_size
+        with contextlib.suppress(OSError):
+            prefix_dir.rmdir()
+    return removed, freed
@@ -1,17 +1,20 @@
 import logging
-import shutil
 
 import click
 
-from .cli import cli, dl_zip
-from .license_info import license_info
-
-license_info["boto3"] = "Apache 2.0 License"
+from . import blobs
+from .builds import Build
+from .cli import cli, extract_zip
 
 
 @click.command
 @click.pass_context
-def boto3(ctx):
+@click.option(
+    "--dedupe-across-services",
+    is_flag=True,
+    help="Dedupe all the service txts together, so a paragraph is only kept in the first one it appears in.",  # noqa: E501
+)
+def boto3(ctx, dedupe_across_services: bool):
     scratchspace = ctx.obj["scratchspace"] / "boto3"
     scratchspace.mkdir(exist_ok=True)
 
@@ -19,14 +22,21 @@ def boto3(ctx):
     logging.info(
         f"Downloading boto3 {version} txts from github.com/abidsikder/boto3-llms-txt"
     )
-    dl_zip(
-        "https://github.com/abidsikder/boto3-llms-txt/archive/refs/heads/master.zip",
-        scratchspace,
+    build = Build(ctx, version)
+    build.options["dedupe_across"] = dedupe_across_services
+    resp = build.fetch(
+        "https://github.com/abidsikder/boto3-llms-txt/archive/refs/heads/master.zip"
     )
+    if build.is_fresh():
+        return
+    extract_zip(resp.path, scratchspace)
     extracted = scratchspace / "boto3-llms-txt-master"
-    for boto3_txt in (extracted / "docs" / "txts").glob("*.txt"):
+    txt_dests = []
+    for boto3_txt in sorted((extracted / "docs" / "txts").glob("*.txt")):
         txt_dest = ctx.obj["txts"] / f"boto3-{version}-{boto3_txt.name}"
-        shutil.copyfile(boto3_txt, txt_dest)
+        blobs.copy(boto3_txt, txt_dest)
+        txt_dests.append(txt_dest)
+    build.done(*txt_dests)
 
     logging.info("Done copying over all boto3 txts")
 
@@ -0,0 +1,85 @@
+"""
+The build-all command, which builds every documentation set and then the website.
+"""
+
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import click
+
+from . import blobs, builds, httpcache, versions
+from .cli import build_all_variants, build_site, cli, new_cpu_pool
+
+
+@click.command
+@click.pass_context
+@click.option(
+    "--net-jobs",
+    default=8,
+    show_default=True,
+    help="Number of documentation sets being downloaded and built at once.",
+)
+@click.option(
+    "--cpu-jobs",
+    type=int,
+    default=os.cpu_count(),
+    help="Number of processes used for parsing and conversion. [default: cpu count]",
+)
+def build_all(ctx, net_jobs: int, cpu_jobs: int):
+    """
+    Build every documentation set in this process, then build the website.
+    """
+    jobs = []
+    for name in cli.list_commands(ctx.parent):
+        if name in ("build-all", "build-site", "history"):
+            continue
+        # Importing the command's module also adds its build_all_variants and
+        # latest_release_sources
+        command = cli.get_command(ctx.parent, name)
+        assert command is not None
+        for args in build_all_variants.get(name, [[]]):
+            jobs.append((name, command, args))
+
+    def run(name, command, args):
+        # Parented to the cli group so that it looks the same as invoking it directly
+        sub_ctx = command.make_context(name, list(args), parent=ctx.parent)
+        with sub_ctx:
+            command.invoke(sub_ctx)
+
+    logging.info(
+        f"Building {len(jobs)} documentation sets with {net_jobs} at once and "
+        f"{cpu_jobs} processes for conversion"
+    )
+    versions.resolve_all(net_jobs)
+
+    failed = []
+    with new_cpu_pool(cpu_jobs) as cpu_pool, ThreadPoolExecutor(net_jobs) as net_pool:
+        ctx.obj["cpu_pool"] = cpu_pool
+        futures = {
+            net_pool.submit(run, name, command, args): " ".join([name, *args])
+            for name, command, args in jobs
+        }
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception:
+                logging.exception(f"Failed building {futures[future]}")
+                failed.append(futures[future])
+        del ctx.obj["cpu_pool"]
+
+    ctx.invoke(build_site)
+
+    removed, freed = blobs.collect_garbage(
+        httpcache.cached_sha256s() | builds.input_sha256s(ctx.obj["scratchspace"])
+    )
+    logging.info(
+        f"Removed {removed} blobs that nothing uses anymore, {freed / 1e6:.1f}MB"
+    )
+    if len(failed) > 0:
+        logging.error(f"Failed to build {', '.join(sorted(failed))}")
+        sys.exit(1)
+
+
+cli.add_command(build_all)
@@ -0,0 +1,240 @@
+"""
+Build manifest for incremental builds. Each documentation set records its version,
+the hashes of its upstream inputs, a hash of the pipeline code that produced it and
+its outputs. When none of those changed the command returns without redoing any
+work, unless --force was passed.
+
+Finishing a build also runs the post-conversion stages on its outputs, and every
+build, skipped or not, is recorded in the build history.
+"""
+
+import functools
+import hashlib
+import itertools
+import json
+import logging
+import resource
+import sys
+import time
+from pathlib import Path
+
+from . import blobs, history
+from .cli import cpu_map, run_cpu
+from .dedupe import dedupe_file, dedupe_files
+from .httpcache import CachedResponse, fetch, fetch_curl, write_atomic
+from .profiling import doc_set_name, pool_usage, stage
+from .shards import estimate_tokens, remove_shards, shard_file
+from .sources import SourceTree, sparse_checkout, sparse_patterns
+
+# Modules besides the command's own whose code goes into every documentation set
+shared_modules = [
+    Path(__file__).parent / m
+    for m in [
+        "blobs.py",
+        "cli.py",
+        "cleanup.py",
+        "dedupe.py",
+        "shards.py",
+        "sources.py",
+    ]
+]
+
+
+# The code files don't change while running
+code_sha256 = functools.cache(blobs.file_sha256)
+
+
+def manifest_dir(scratchspace: Path) -> Path:
+    return scratchspace / "builds"
+
+
+def input_sha256s(scratchspace: Path) -> set[str]:
+    """The hashes of the inputs that the build manifests point to."""
+    return {
+        sha256
+        for p in manifest_dir(scratchspace).glob("*.json")
+        for sha256 in json.loads(p.read_text())["inputs"].values()
+    }
+
+
+class Build:
+    """
+    One build of a documentation set. Fetch upstream inputs through it, check
+    is_fresh before doing any real work, and call done with the outputs at the end.
+    """
+
+    def __init__(self, ctx, version: str):
+        self.ctx = ctx
+        self.started_at = time.time()
+        self.wall_start = time.perf_counter()
+        # Work that isn't put on the process pool is done on this thread
+        self.cpu_start = time.thread_time()
+        self.downloaded_bytes = 0
+        self.name = doc_set_name(ctx)
+        self.version = version
+        # The actual release when it's only known after processing, e.g. zig master
+        self.release = version
+        self.force = ctx.obj.get("force", False)
+        # Post-conversion stages, which change the outputs so they're part of
+        # what decides whether a build is fresh
+        self.options = {
+            "dedupe": ctx.obj.get("dedupe", False),
+            # Dedupe the outputs together instead of each on its own
+            "dedupe_across": False,
+            "shard_tokens": ctx.obj.get("shard_tokens"),
+        }
+        self.inputs: dict[str, str] = dict()
+        code_ps = [Path(sys.modules[ctx.command.callback.__module__].__file__ or "")]
+        code_ps += shared_modules
+        self.code = hashlib.sha256(
+            "".join(code_sha256(p) for p in code_ps).encode()
+        ).hexdigest()
+        key = hashlib.sha256(self.name.encode()).hexdigest()
+        self.manifest_p = manifest_dir(ctx.obj["scratchspace"]) / f"{key}.json"
+
+    def add_input(self, resp: CachedResponse) -> CachedResponse:
+        self.inputs[resp.url] = resp.sha256
+        self.downloaded_bytes += resp.downloaded_bytes
+        return resp
+
+    def fetch(self, url: str) -> CachedResponse:
+        with stage(self.ctx, "download"):
+            return self.add_input(fetch(url))
+
+    def fetch_curl(self, url: str) -> CachedResponse:
+        with stage(self.ctx, "download"):
+            return self.add_input(fetch_curl(url))
+
+    def fetch_source(
+        self, gh_id: str, tag: str, pattern: str, exclude="", root=""
+    ) -> SourceTree:
+        """
+        The source of a github repo at tag for collecting pattern from (like
+        collect_tgz), either its tarball or, with --fetch-backend git, a sparse
+        checkout of just what's collected.
+        """
+        if self.ctx.obj.get("fetch_backend") != "git":
+            url = f"https://github.com/{gh_id}/archive/refs/tags/{tag}.tar.gz"
+            resp = self.fetch(url)
+            return SourceTree(pattern, root, exclude, tarball=resp.path)
+        repo_url = f"https://github.com/{gh_id}.git"
+        with stage(self.ctx, "download"):
+            checkout, commit = sparse_checkout(
+                self.ctx.obj["scratchspace"] / "git",
+                repo_url,
+                tag,
+                sparse_patterns(pattern, root),
+            )
+        self.inputs[f"{repo_url}#{tag}"] = commit
+        return SourceTree(pattern, root, exclude, checkout=checkout)
+
+    def previous(self) -> dict | None:
+        if not self.manifest_p.exists():
+            return None
+        return json.loads(self.manifest_p.read_text())
+
+    def is_fresh(self) -> bool:
+        """True if the last build had the same version, inputs and code, and its
+        outputs are untouched since."""
+        if self.force:
+            return False
+        prev = self.previous()
+        if prev is None:
+            return False
+        if (
+            prev["version"] != self.version
+            or prev["inputs"] != self.inputs
+            or prev["code"] != self.code
+            or prev.get("options") != self.options
+        ):
+            return False
+        for output, stat in prev["outputs"].items():
+            output_p = Path(output)
+            if not output_p.exists():
+                return False
+            st = output_p.stat()
+            if [st.st_size, st.st_mtime_ns] != stat:
+                return False
+        logging.info(f"{self.name} {self.version} is up to date, skipping")
+        outputs = [Path(p) for p in prev["outputs"]]
+        self.record(prev.get("release", self.version), outputs, fresh=True)
+        return True
+
+    def map_outputs(self, fn, outputs: list[Path], *args) -> list:
+        """Run a post-conversion stage on each output, on the process pool."""
+        if len(outputs) == 1:
+            return [run_cpu(self.ctx, fn, outputs[0], *args)]
+        return list(
+            cpu_map(self.ctx, fn, outputs, *(itertools.repeat(a) for a in args))
+        )
+
+    def done(self, *outputs: Path):
+        outputs_list = list(outputs)
+        if self.options["dedupe"]:
+            if self.options["dedupe_across"]:
+                run_cpu(self.ctx, dedupe_files, outputs_list)
+            else:
+                self.map_outputs(dedupe_file, outputs_list)
+        if self.options["shard_tokens"] is not None:
+            # The shards are outputs too, so that deleting them triggers a rebuild
+            for shard_ps in self.map_outputs(
+                shard_file,
+                list(outputs),
+                self.ctx.obj["shards"],
+                self.options["shard_tokens"],
+            ):
+                outputs_list += shard_ps
+        else:
+            for p in outputs:
+                remove_shards(p, self.ctx.obj["shards"])
+
+        entry = {
+            "name": self.name,
+            "version": self.version,
+            "release": self.release,
+            "inputs": self.inputs,
+            "code": self.code,
+            "options": self.options,
+            "outputs": {
+                str(p): [p.stat().st_size, p.stat().st_mtime_ns] for p in outputs_list
+            },
+            "built_at": time.time(),
+        }
+        self.manifest_p.parent.mkdir(parents=True, exist_ok=True)
+        write_atomic(
+            self.manifest_p, lambda f: f.write(json.dumps(entry, indent=2).encode())
+        )
+        self.record(self.release, outputs_list)
+
+    def record(self, release: str, outputs: list[Path], fresh=False):
+        """Add this build to the build history."""
+        usage = pool_usage(self.ctx)
+        # Shards repeat what's in the txts they're split from
+        output_bytes = sum(
+            p.stat().st_size
+            for p in outputs
+            if p.exists() and not p.is_relative_to(self.ctx.obj["shards"])
+        )
+        if self.ctx.obj.get("cpu_pool") is None:
+            # Run on its own, so the process's peak is this build's
+            peak_rss_bytes = max(
+                resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+                usage.max_rss_bytes,
+            )
+        else:
+            # Under build-all the process's peak is the highest of every build so
+            # far, only the peaks of this build's calls on the pool are its own
+            peak_rss_bytes = usage.max_rss_bytes
+        history.record(
+            self.ctx.obj["scratchspace"],
+            name=self.name,
+            version=release,
+            started_at=self.started_at,
+            wall_s=time.perf_counter() - self.wall_start,
+            cpu_s=time.thread_time() - self.cpu_start + usage.cpu_s,
+            peak_rss_bytes=peak_rss_bytes,
+            downloaded_bytes=self.downloaded_bytes,
+            output_bytes=output_bytes,
+            tokens=estimate_tokens(output_bytes),
+            fresh=fresh,
+        )
@@ -0,0 +1,115 @@
+"""
+catalog.json, a machine readable list of every documentation set on the site, so
+that mirrors and agents can tell what changed from the sha256s instead of scraping
+index.html and downloading the txts again.
+
+Hashes are cached by path, size and mtime in scratchspace, so only txts that were
+rebuilt since the last build-site get read.
+"""
+
+import json
+import re
+from pathlib import Path
+
+from .blobs import file_sha256
+from .license_info import license_info
+
+
+def normalized(name: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+def license_for(tool: str) -> str | None:
+    """
+    The license_info entry of a tool as plain text, matching names like "Node.js"
+    to nodejs, and "dom / Web APIs" to dom.
+    """
+    matches = [
+        license
+        for key, license in license_info.items()
+        if normalized(key) == normalized(tool)
+    ] + [
+        license
+        for key, license in license_info.items()
+        if re.match(re.escape(tool.lower()) + r"\W", key.lower())
+    ]
+    if len(matches) == 0:
+        return None
+    # Some are links for the site
+    return " ".join(re.sub(r"<[^>]+>", " ", matches[0]).split())
+
+
+def tool_and_version(txt_name: str) -> tuple[str, str]:
+    """
+    Guess from the name of a txt without a build manifest, e.g. python-3.13.5.txt
+    is python 3.13.5.
+    """
+    stem = txt_name.rsplit(".", 1)[0]
+    m = re.match(r"(.+?)-(\d.*|latest|master)$", stem)
+    if m is None:
+        return stem, ""
+    return m[1], m[2]
+
+
+def load_builds(manifest_dir: Path) -> dict[str, dict]:
+    """The latest build manifest of every output, by output path."""
+    builds = {}
+    if not manifest_dir.exists():
+        return builds
+    for manifest_p in manifest_dir.glob("*.json"):
+        manifest = json.loads(manifest_p.read_text())
+        for output in manifest["outputs"]:
+            prev = builds.get(output)
+            if prev is None or prev["built_at"] < manifest["built_at"]:
+                builds[output] = manifest
+    return builds
+
+
+def build_catalog(txt_ps: list[Path], scratchspace: Path) -> list[dict]:
+    cache_p = scratchspace / "catalog-cache.json"
+    cache = json.loads(cache_p.read_text()) if cache_p.exists() else {}
+    builds = load_builds(scratchspace / "builds")
+
+    entries = []
+    new_cache = {}
+    for txt_p in txt_ps:
+        st = txt_p.stat()
+        cached = cache.get(str(txt_p))
+        if cached is not None and [cached["size"], cached["mtime_ns"]] == [
+            st.st_size,
+            st.st_mtime_ns,
+        ]:
+            sha256 = cached["sha256"]
+        else:
+            sha256 = file_sha256(txt_p)
+        new_cache[str(txt_p)] = {
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "sha256": sha256,
+        }
+
+        build = builds.get(str(txt_p))
+        if build is not None:
+            tool = build["name"].split(" ", 1)[0]
+            version = build["release"]
+            built_at = build["built_at"]
+        else:
+            tool, version = tool_and_version(txt_p.name)
+            built_at = st.st_mtime
+        entries.append(
+            {
+                "name": txt_p.name,
+                "path": f"txts/{txt_p.name}",
+                "tool": tool,
+                "version": version,
+                "bytes": st.st_size,
+                # Same estimate as the index
+                "tokens": st.st_size // 4,
+                "sha256": sha256,
+                "license": license_for(tool),
+                "built_at": built_at,
+            }
+        )
+
+    cache_p.write_text(json.dumps(new_cache))
+    return entries
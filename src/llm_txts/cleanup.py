@@ -0,0 +1,288 @@
+"""
+Declarative html cleanup. Each source describes what to remove as a table of
+rules, a selector plus an action, which is compiled once and then applied to a
+page in a single walk of its lxml tree.
+
+Selectors are a small subset of css: a tag name or *, followed by any of #id,
+.class, [attr], [attr=value] and [attr^=value].
+"""
+
+import re
+from collections.abc import Iterator
+from dataclasses import dataclass
+
+import lxml.html
+
+from .profiling import stage
+
+# Remove the element and everything in it
+DROP = "drop"
+# Remove the element but keep its text and children in its place
+UNWRAP = "unwrap"
+# DROP, and also drop the element right after it if that matches Rule.next
+DROP_WITH_NEXT = "drop-with-next"
+
+
+@dataclass(frozen=True)
+class Rule:
+    selector: str
+    action: str = DROP
+    # For DROP_WITH_NEXT, the selector the following sibling has to match
+    next: str | None = None
+    # Only apply the rule if the element's whole text is exactly this
+    text: str | None = None
+
+
+# Remove intra-document links that just have a content of "#", and
+# emphasis and italics
+common_rules = [
+    Rule('a[href^="#"]', text="#"),
+    Rule("strong", UNWRAP),
+    Rule("em", UNWRAP),
+]
+
+
+selector_re = re.compile(
+    r"""
+    (?P<tag>[\w-]+|\*)?
+    (?P<rest>(?:
+        \#[\w-]+
+        | \.[\w-]+
+        | \[[\w-]+(?:\^?=(?:"[^"]*"|'[^']*'|[^\]]*))?\]
+    )*)
+    """,
+    re.VERBOSE,
+)
+part_re = re.compile(
+    r"""
+    \#(?P<id>[\w-]+)
+    | \.(?P<class>[\w-]+)
+    | \[(?P<attr>[\w-]+)(?:(?P<op>\^?=)(?P<value>"[^"]*"|'[^']*'|[^\]]*))?\]
+    """,
+    re.VERBOSE,
+)
+
+
+class Matcher:
+    """A compiled selector."""
+
+    def __init__(self, selector: str):
+        m = selector_re.fullmatch(selector.strip())
+        if m is None:
+            raise ValueError(f"Unsupported selector {selector!r}")
+        self.tag = m["tag"] if m["tag"] not in (None, "*") else None
+        self.id = None
+        self.classes: set[str] = set()
+        # (name, operator, value), operator is None for a bare [attr]
+        self.attrs: list[tuple[str, str | None, str]] = []
+        for part in part_re.finditer(m["rest"]):
+            if part["id"] is not None:
+                self.id = part["id"]
+            elif part["class"] is not None:
+                self.classes.add(part["class"])
+            else:
+                value = part["value"] or ""
+                if value[:1] in ("'", '"'):
+                    value = value[1:-1]
+                self.attrs.append((part["attr"], part["op"], value))
+
+    def matches(self, el) -> bool:
+        if self.tag is not None and el.tag != self.tag:
+            return False
+        attrib = el.attrib
+        if self.id is not None and attrib.get("id") != self.id:
+            return False
+        if self.classes and not self.classes.issubset(attrib.get("class", "").split()):
+            return False
+        for name, op, value in self.attrs:
+            actual = attrib.get(name)
+            if actual is None:
+                return False
+            if op == "=" and actual != value:
+                return False
+            if op == "^=" and not actual.startswith(value):
+                return False
+        return True
+
+
+def next_element(el):
+    """The next sibling that is an element, like the css + combinator."""
+    sibling = el.getnext()
+    while sibling is not None and not isinstance(sibling.tag, str):
+        sibling = sibling.getnext()
+    return sibling
+
+
+class Rules:
+    """
+    Rule tables compiled into matchers indexed by tag, so each element is only
+    checked against the rules that could apply to it.
+    """
+
+    def __init__(self, *tables: list[Rule]):
+        compiled = [
+            (
+                Matcher(rule.selector),
+                rule,
+                Matcher(rule.next) if rule.next is not None else None,
+            )
+            for table in tables
+            for rule in table
+        ]
+        # Rules without a tag apply to every element, after the ones for its tag
+        self.any_tag = [c for c in compiled if c[0].tag is None]
+        self.by_tag: dict[str, list[tuple[Matcher, Rule, Matcher | None]]] = {}
+        for c in compiled:
+            if c[0].tag is not None:
+                self.by_tag.setdefault(c[0].tag, []).append(c)
+        for candidates in self.by_tag.values():
+            candidates += self.any_tag
+
+    def match(self, el) -> tuple[Rule, Matcher | None] | None:
+        for matcher, rule, next_matcher in self.by_tag.get(el.tag, self.any_tag):
+            if matcher.matches(el) and (
+                rule.text is None or el.text_content() == rule.text
+            ):
+                return rule, next_matcher
+        return None
+
+    def apply(self, root):
+        """
+        Walk the tree once, without descending into anything that gets dropped,
+        then make all the changes.
+        """
+        dropped = []
+        unwrapped = []
+        dropped_siblings = set()
+        stack = [root]
+        while stack:
+            el = stack.pop()
+            if not isinstance(el.tag, str) or el in dropped_siblings:
+                continue
+            matched = self.match(el)
+            if matched is not None:
+                rule, next_matcher = matched
+                if rule.action == UNWRAP:
+                    unwrapped.append(el)
+                else:
+                    dropped.append(el)
+                    if rule.action == DROP_WITH_NEXT:
+                        sibling = next_element(el)
+                        if (
+                            sibling is not None
+                            and next_matcher is not None
+                            and next_matcher.matches(sibling)
+                        ):
+                            dropped.append(sibling)
+                            dropped_siblings.add(sibling)
+                    continue
+            stack.extend(reversed(el))
+        for el in dropped:
+            el.drop_tree()
+        for el in unwrapped:
+            el.drop_tag()
+
+
+def parse(html: str):
+    """Parse a page, or an empty document for a page with nothing in it."""
+    try:
+        return lxml.html.document_fromstring(html)
+    except lxml.html.etree.ParserError:
+        return lxml.html.document_fromstring("<html></html>")
+
+
+def select(root, selector: str) -> list:
+    """Every element under root, root included, that matches selector."""
+    matcher = Matcher(selector)
+    return [
+        el
+        for el in root.iter(matcher.tag or lxml.html.etree.Element)
+        if matcher.matches(el)
+    ]
+
+
+def to_html(el) -> str:
+    return lxml.html.tostring(el, encoding="unicode", with_tail=False)
+
+
+# Elements with more descendants than this are serialized by html_blocks a few
+# children at a time, BLOCK_CHILDREN at most, instead of all at once
+BLOCK_ELEMENTS = 1000
+BLOCK_CHILDREN = 64
+
+
+def clean_html(html: str, rules: Rules, content: str | None = None) -> str:
+    """
+    Apply rules to a page and give back its html. With content, only the
+    elements matching that selector are kept.
+    """
+    with stage(None, "parse"):
+        root = parse(html)
+    with stage(None, "cleanup"):
+        parts = select(root, content) if content is not None else [root]
+        for part in parts:
+            rules.apply(part)
+        return "".join(to_html(part) for part in parts)
+
+
+def clean_html_blocks(
+    html: str, rules: Rules, content: str | None = None
+) -> Iterator[str]:
+    """
+    Like clean_html, but the html comes out in blocks (see html_blocks) for
+    write_markdown, so it's never serialized all at once.
+    """
+    with stage(None, "parse"):
+        root = parse(html)
+    with stage(None, "cleanup"):
+        parts = select(root, content) if content is not None else [root]
+        for part in parts:
+            rules.apply(part)
+    return (block for part in parts for block in html_blocks(part))
+
+
+def html_blocks(el, with_tail=False) -> Iterator[str]:
+    """
+    to_html(el) in consecutive pieces that are each cut right before a tag.
+    Elements with more than BLOCK_ELEMENTS descendants are split up, the runs of
+    children in between the big ones go BLOCK_CHILDREN at a time.
+    """
+    if len(el) == 0 or el.xpath("count(descendant::*)") <= BLOCK_ELEMENTS:
+        yield lxml.html.tostring(el, encoding="unicode", with_tail=with_tail)
+        return
+    big = set(el.xpath(f"*[count(descendant::*) > {BLOCK_ELEMENTS}]"))
+    children = iter(list(el))
+    # The start tag, text and tail, serialized (and escaped) by lxml without the
+    # children in between. They're put back as they get serialized.
+    del el[:]
+    try:
+        shallow = to_html(el)
+        tail = ""
+        if with_tail:
+            tail = lxml.html.tostring(el, encoding="unicode", with_tail=True)
+            tail = tail.removeprefix(shallow)
+        end_tag = f"</{el.tag}>"
+        yield shallow.removesuffix(end_tag)
+
+        batch = el.makeelement("div")
+
+        def flush() -> str:
+            html = to_html(batch).removeprefix("<div>").removesuffix("</div>")
+            el.extend(list(batch))
+            return html
+
+        for child in children:
+            if child not in big:
+                batch.append(child)
+                if len(batch) == BLOCK_CHILDREN:
+                    yield flush()
+                continue
+            if len(batch) > 0:
+                yield flush()
+            el.append(child)
+            yield from html_blocks(child, with_tail=True)
+        if len(batch) > 0:
+            yield flush()
+    finally:
+        el.extend(children)
+    yield end_tag + tail
@@ -2,112 +2,271 @@
 Contains the click.group cli entrypoint, and any utility functions.
 """
 
+import fnmatch
+import functools
+import html.entities
+import importlib
 import io
-import itertools
+import json
 import logging
-import subprocess
+import multiprocessing
+import os
+import re
 import sys
 import tarfile
 import zipfile
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
+from typing import TYPE_CHECKING, Any, TextIO
 
 import click
-import html2text
-import httpx
+from click.shell_completion import CompletionItem
 
+from . import blobs, compress, profiling, workspace
+from .catalog import build_catalog
 from .license_info import license_info
 
+if TYPE_CHECKING:
+    import html2text
 
-def dl_zip_curl(dl_url: str, dest: Path):
-    """dest should be the zip path, e.g. scratchspace/foo-latest.zip"""
-    # -L follows redirects
-    subprocess.run(["curl", "-L", "-o", str(dest), dl_url], check=True)
-    with zipfile.ZipFile(dest, "r") as zip_ref:
-        zip_ref.extractall(dest.parent)
-
-
-def dl_zip(dl_url: str, dest: Path):
-    """Download a zip file from a url and extract to a directory."""
-    zip_resp = httpx.get(dl_url, follow_redirects=True)
-    zip_buffer = io.BytesIO(zip_resp.content)
-    with zipfile.ZipFile(zip_buffer, "r") as zip_ref:
-        zip_ref.extractall(dest)
-
-
-def dl_tgz(url: str, dest: Path):
-    """Download a .tar.gz file and write it to destination."""
-    resp = httpx.get(url, follow_redirects=True)
-    with tarfile.open(fileobj=io.BytesIO(resp.content), mode="r|gz") as f:
-        f.extractall(path=dest)
-
-
-def collect(pattern: str, source: Path, dest: Path, exclude=""):
-    args = [
-        "code2prompt",
-        "--no-codeblock",
-        "--no-clipboard",
-        "--template",
-        Path("code2prompt-minimal.hbs"),
-        "--include",
-        pattern,
-        source,
-        "--output-file",
-        dest,
+# Extra argument lists that build-all invokes a subcommand with, one invocation per
+# list. Subcommands that aren't in here get invoked once with no arguments.
+build_all_variants: dict[str, list[list[str]]] = dict()
+
+
+def extract_zip(zip_p: Path, dest: Path):
+    """
+    Extract a downloaded zip file to a directory. Files are put in the blob store
+    and hardlinked (or reflinked) from it, so extracting the same content again,
+    e.g. on the next run, doesn't write it again.
+    """
+    with profiling.stage(None, "extract"), zipfile.ZipFile(zip_p, "r") as zip_ref:
+        for info in zip_ref.infolist():
+            # Dropping the parts that would escape dest, like extractall does
+            parts = [p for p in info.filename.split("/") if p not in ("", ".", "..")]
+            if len(parts) == 0:
+                continue
+            member_p = dest.joinpath(*parts)
+            if info.is_dir():
+                member_p.mkdir(parents=True, exist_ok=True)
+                continue
+            member_p.parent.mkdir(parents=True, exist_ok=True)
+            with zip_ref.open(info) as f:
+                blobs.materialize(blobs.put_stream(f, info.file_size), member_p)
+
+
+def extract_tgz(tgz_p: Path, dest: Path):
+    """Extract a downloaded .tar.gz file to destination, like extract_zip."""
+    with profiling.stage(None, "extract"), tarfile.open(tgz_p, mode="r|gz") as tar:
+        for member in tar:
+            # Raises for members that would escape dest
+            member = tarfile.tar_filter(member, str(dest))
+            member_p = dest / member.name
+            if member.isreg():
+                member_f = tar.extractfile(member)
+                assert member_f is not None
+                member_p.parent.mkdir(parents=True, exist_ok=True)
+                blobs.materialize(blobs.put_stream(member_f, member.size), member_p)
+            else:
+                # Directories, symlinks, ...
+                tar.extract(member, path=dest, filter="tar")
+
+
+# Number of calls cpu_map has in flight on the process pool at once
+CPU_MAP_WINDOW = 64
+
+# Number of threads collect reads files with
+COLLECT_READ_JOBS = 8
+
+# Characters of html that html_chunks reads at a time
+HTML_CHUNK_SIZE = 1024 * 1024
+
+
+def compile_patterns(patterns: str) -> list[re.Pattern]:
+    """
+    Compile comma separated glob patterns the way collect interprets them. Like
+    code2prompt, * also matches across directories, so "**.md" and "*.md" both match
+    markdown files at any depth. Patterns are matched against the path relative to
+    the collected directory, and a pattern without a / is also matched against just
+    the file name so that an exclude like "cli.md" works at any depth.
+    """
+    return [
+        re.compile(fnmatch.translate(p.strip()))
+        for p in patterns.split(",")
+        if len(p.strip()) > 0
     ]
-    # exclude patterns have to be nonempty or code2prompt ignores everything
-    if len(exclude) > 0:
-        args.append("--exclude")
-        args.append(exclude)
-    subprocess.run(
-        args,
-        stdout=subprocess.DEVNULL,
-        stderr=subprocess.DEVNULL,
-        check=True,
-    )
 
 
-def gh_latest_tag(gh_id: str) -> str:
-    """Give the github url without a forward slash at the end"""
-    resp = httpx.get(f"https://github.com/{gh_id}/releases/latest")
-    redirect_url = resp.headers["Location"]
-    latest_tag = redirect_url.rsplit("/", 1)[-1]
-    if latest_tag[0] == "v":
-        latest_tag = latest_tag[1:]
-    return latest_tag
+def is_collected(rel_path: str, include: list[re.Pattern], exclude: list[re.Pattern]):
+    name = rel_path.rsplit("/", 1)[-1]
 
+    def matches(p: re.Pattern):
+        if p.match(rel_path):
+            return True
+        return "/" not in p.pattern and p.match(name) is not None
 
-def common_soup_clean(soup):
-    # Remove intra-document links that just have a content of "#"
-    for a_tag in soup.select('a[href^="#"]'):
-        if a_tag.string == "#":
-            a_tag.decompose()
+    return any(matches(p) for p in include) and not any(matches(p) for p in exclude)
 
-    # Remove emphasis and italics
-    for elem in soup.find_all("strong"):
-        elem.unwrap()
-    for elem in soup.find_all("em"):
-        elem.unwrap()
 
+def collected_text(content: bytes) -> str | None:
+    """
+    How a collected file is laid out in the collated output. This is the layout the
+    code2prompt template this replaced produced, so outputs stay the same. None for
+    files that aren't utf-8 text, which get skipped like code2prompt did.
+    """
+    try:
+        return f"    {content.decode()}\n"
+    except UnicodeDecodeError:
+        return None
 
-@click.group()
-@click.pass_context
-def cli(ctx):
-    if not Path("./.git").exists():
-        logging.error(
-            f"Must be called from the repo root! Being called from {Path.cwd()}"
-        )
-        sys.exit(1)
 
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s - %(levelname)s - %(message)s",
-        datefmt="%Y-%m-%dT%H:%M:%S",  # ISO 8601 format
-        stream=sys.stderr,
-    )
+def write_collected(f, contents: list[tuple[str, bytes]]):
+    """Write out collected files sorted by their relative path."""
+    for _, content in sorted(contents):
+        text = collected_text(content)
+        if text is not None:
+            f.write(text)
+
+
+def archive_rel_path(name: str, root: str) -> str | None:
+    """
+    Path of an archive member relative to root, where root is relative to the
+    single top level directory that github and readthedocs archives have. None if
+    the member is outside of root.
+    """
+    parts = name.split("/", 1)
+    if len(parts) < 2:
+        return None
+    rel_path = parts[1]
+    if len(root) == 0:
+        return rel_path
+    prefix = root.rstrip("/") + "/"
+    if not rel_path.startswith(prefix):
+        return None
+    return rel_path[len(prefix) :]
+
+
+def collect_tgz(tgz_p: Path, pattern: str, dest: Path, exclude="", root=""):
+    """
+    Like collect, but reads the matching files straight out of a downloaded .tar.gz
+    instead of collecting from an extracted directory.
+    """
+    with profiling.stage(None, "collect"):
+        contents = archive_contents_tgz(tgz_p, pattern, exclude, root)
+        with dest.open(mode="w") as f:
+            write_collected(f, contents)
+
+
+def archive_contents_tgz(
+    tgz_p: Path, pattern: str, exclude: str, root: str
+) -> list[tuple[str, bytes]]:
+    include_ps = compile_patterns(pattern)
+    exclude_ps = compile_patterns(exclude)
+    contents = []
+    with tarfile.open(tgz_p, mode="r|gz") as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            rel_path = archive_rel_path(member.name, root)
+            if rel_path is None or not is_collected(rel_path, include_ps, exclude_ps):
+                continue
+            member_f = tar.extractfile(member)
+            if member_f is not None:
+                contents.append((rel_path, member_f.read()))
+    return contents
+
+
+def collect_zip(zip_p: Path, pattern: str, dest: Path, exclude="", root=""):
+    """Like collect_tgz but for zips."""
+    with profiling.stage(None, "collect"):
+        contents = archive_contents_zip(zip_p, pattern, exclude, root)
+        with dest.open(mode="w") as f:
+            write_collected(f, contents)
+
+
+def archive_contents_zip(
+    zip_p: Path, pattern: str, exclude: str, root: str
+) -> list[tuple[str, bytes]]:
+    include_ps = compile_patterns(pattern)
+    exclude_ps = compile_patterns(exclude)
+    contents = []
+    with zipfile.ZipFile(zip_p, "r") as zip_ref:
+        for info in zip_ref.infolist():
+            if info.is_dir():
+                continue
+            rel_path = archive_rel_path(info.filename, root)
+            if rel_path is None or not is_collected(rel_path, include_ps, exclude_ps):
+                continue
+            contents.append((rel_path, zip_ref.read(info)))
+    return contents
+
+
+def collected_paths(pattern: str, source: Path, exclude="") -> list[Path]:
+    """
+    All files under source matching the include/exclude patterns (see
+    compile_patterns), sorted by their path relative to source so that the collated
+    output is deterministic.
+    """
+    include_ps = compile_patterns(pattern)
+    exclude_ps = compile_patterns(exclude)
+    matched = []
+    for dirpath, _, filenames in os.walk(source):
+        dir_p = Path(dirpath)
+        rel_dir = dir_p.relative_to(source).as_posix()
+        for filename in filenames:
+            rel_path = filename if rel_dir == "." else f"{rel_dir}/{filename}"
+            if is_collected(rel_path, include_ps, exclude_ps):
+                matched.append((rel_path, dir_p / filename))
+    return [p for _, p in sorted(matched)]
+
+
+def iter_collected(paths: Iterable[Path], jobs=COLLECT_READ_JOBS) -> Iterator[str]:
+    """
+    Yield the collated text of each file in order. Files are read ahead on a thread
+    pool, but only a few at a time so memory stays bounded for large collections.
+    """
+    with ThreadPoolExecutor(jobs) as pool:
+        pending = deque()
+        for p in paths:
+            pending.append(pool.submit(p.read_bytes))
+            if len(pending) >= jobs * 4:
+                text = collected_text(pending.popleft().result())
+                if text is not None:
+                    yield text
+        while len(pending) > 0:
+            text = collected_text(pending.popleft().result())
+            if text is not None:
+                yield text
+
+
+def collect(pattern: str, source: Path, dest: Path | TextIO, exclude=""):
+    """
+    Collate every file under source matching pattern and not exclude into dest,
+    which is either a path to (over)write or an open text stream to append to.
+    """
+    with profiling.stage(None, "collect"):
+        texts = iter_collected(collected_paths(pattern, source, exclude=exclude))
+        if isinstance(dest, Path):
+            with dest.open(mode="w") as f:
+                f.writelines(texts)
+        else:
+            dest.writelines(texts)
 
-    ctx.ensure_object(dict)
 
-    text_maker = html2text.HTML2Text()
+def make_text_maker() -> "html2text.HTML2Text":
+    """
+    HTML2Text instances hold parsing state, so anything that may run concurrently
+    (threads under build-all, process pool workers) should make its own.
+    """
+    # Imported here so that only the commands that convert html load it
+    import html2text
+
+    if profiling.current_report(None) is not None:
+        text_maker = profiled_text_maker_class()()
+    else:
+        text_maker = html2text.HTML2Text()
     # options to shorten the text generated and use more of the context
     text_maker.ignore_images = True
     text_maker.body_width = 0  # no wrap for long lines of text
@@ -116,21 +275,337 @@ def cli(ctx):
     text_maker.ignore_emphasis = True
     text_maker.ignore_tables = True
     text_maker.single_line_break = True
-    ctx.obj["text_maker"] = text_maker
+    return text_maker
+
+
+def write_markdown(html_blocks: Iterable[str], f: TextIO, text_maker=None):
+    """
+    Convert html given in consecutive blocks that are each cut right before a tag
+    (like clean_html_blocks') and write the markdown to f as it's produced. The
+    same as f.write(text_maker.handle("".join(html_blocks))) without ever holding
+    all of the html or all of the markdown.
+    """
+    if text_maker is None:
+        text_maker = make_text_maker()
+    # Only handle wraps and pads tables, and both need the whole text
+    assert not text_maker.body_width and not text_maker.pad_tables
+    nbsp = html.entities.html5["nbsp;"] if text_maker.unicode_snob else " "
+    with profiling.stage(None, "html2text"):
+        text_maker.start = True
+        for block in html_blocks:
+            text_maker.feed(block)
+            # handle_tag looks back at the last piece of output, so it's kept
+            pieces = text_maker.outtextlist
+            if len(pieces) > 1:
+                f.write("".join(pieces[:-1]).replace("&nbsp_place_holder;", nbsp))
+                del pieces[:-1]
+        text_maker.feed("")
+        f.write(text_maker.finish())
+
+
+def html_chunks(f: TextIO) -> Iterator[str]:
+    """
+    Read html from f in blocks for write_markdown, for pages that are converted
+    without being cleaned up first.
+    """
+    rest = ""
+    while chunk := f.read(HTML_CHUNK_SIZE):
+        chunk = rest + chunk
+        cut = chunk.rfind("<")
+        if cut <= 0:
+            rest = chunk
+            continue
+        yield chunk[:cut]
+        rest = chunk[cut:]
+    if len(rest) > 0:
+        yield rest
+
+
+@functools.cache
+def profiled_text_maker_class() -> "type[html2text.HTML2Text]":
+    import html2text
+
+    class ProfiledHTML2Text(html2text.HTML2Text):
+        def handle(self, data: str) -> str:
+            with profiling.stage(None, "html2text"):
+                return super().handle(data)
+
+    return ProfiledHTML2Text
+
+
+def setup_logging():
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        datefmt="%Y-%m-%dT%H:%M:%S",  # ISO 8601 format
+        stream=sys.stderr,
+    )
+
+
+def new_cpu_pool(jobs: int | None) -> ProcessPoolExecutor:
+    # spawn instead of fork since other threads may be holding locks
+    return ProcessPoolExecutor(
+        jobs, mp_context=multiprocessing.get_context("spawn"), initializer=setup_logging
+    )
+
+
+def run_cpu(ctx, fn, *args):
+    """
+    Run CPU bound work (parsing, cleanup, conversion) on the process pool that
+    build-all sets up, or inline when a single command is being run. fn has to be
+    picklable, so keep it a module level function and prefer passing paths over
+    large strings.
+    """
+    cpu_pool = ctx.obj.get("cpu_pool")
+    if cpu_pool is None:
+        with profiling.stage(ctx, fn.__name__):
+            return fn(*args)
+    return profiling.submit(ctx, cpu_pool, fn, *args).result()
+
+
+def cpu_map(ctx, fn, *iterables) -> Iterator:
+    """
+    Like run_cpu but maps fn over iterables, yielding results in order. Uses the
+    build-all process pool if there is one, otherwise a pool just for this call.
+    Only CPU_MAP_WINDOW calls are in flight at once, so results that finish ahead
+    of the consumer don't pile up in memory.
+    """
+    cpu_pool = ctx.obj.get("cpu_pool")
+    if cpu_pool is not None:
+        yield from windowed_map(ctx, cpu_pool, fn, *iterables)
+        return
+    with new_cpu_pool(None) as cpu_pool:
+        yield from windowed_map(ctx, cpu_pool, fn, *iterables)
+
+
+def concurrently(*calls: Callable[[], Any]) -> list:
+    """
+    Make each call on a thread of its own and give back their results in order,
+    e.g. to overlap downloads from different hosts through the shared http client.
+    """
+    with ThreadPoolExecutor(len(calls)) as pool:
+        futures = [pool.submit(call) for call in calls]
+        return [future.result() for future in futures]
+
+
+def build_versions(
+    ctx, param: str, versions: Iterable[str], build: Callable[[Any, str], Any]
+) -> list:
+    """
+    Call build(version_ctx, version) for each of versions, concurrently, for
+    commands that take several versions at once. version_ctx is like ctx but as if
+    only that version had been asked for, with param set to it, so each version
+    keeps the Build manifest and profile it has when built on its own. Conversions
+    go to the build-all process pool, or a pool just for these builds.
+    """
+
+    def build_one(version: str):
+        version_ctx = click.Context(
+            ctx.command, parent=ctx.parent, info_name=ctx.info_name, obj=ctx.obj
+        )
+        version_ctx.params = {param: version}
+        with version_ctx:
+            return build(version_ctx, version)
+
+    calls = [functools.partial(build_one, v) for v in dict.fromkeys(versions)]
+    if len(calls) == 1 or ctx.obj.get("cpu_pool") is not None:
+        return concurrently(*calls)
+    with new_cpu_pool(None) as cpu_pool:
+        ctx.obj["cpu_pool"] = cpu_pool
+        try:
+            return concurrently(*calls)
+        finally:
+            del ctx.obj["cpu_pool"]
+
+
+def windowed_map(ctx, pool, fn, *iterables) -> Iterator:
+    pending = deque()
+    for args in zip(*iterables, strict=False):
+        pending.append(profiling.submit(ctx, pool, fn, *args))
+        if len(pending) >= CPU_MAP_WINDOW:
+            yield pending.popleft().result()
+    while len(pending) > 0:
+        yield pending.popleft().result()
+
+
+# The module each subcommand is defined in, relative to this package. A module is
+# only imported when one of its subcommands is run, so that --help, build-site and
+# shell completion don't load every scraper along with httpx, lxml, bs4 and so on.
+lazy_commands: dict[str, str] = {
+    "beautifulsoup": ".beautifulsoup",
+    "boto3": ".boto3",
+    "build-all": ".build_all",
+    "commanderjs": ".commanderjs",
+    "history": ".history",
+    "hy": ".hy",
+    "icechunk": ".icechunk",
+    "mlx": ".mlx",
+    "networkx": ".networkx",
+    "nodejs": ".nodejs",
+    "p5js": ".p5js",
+    "progit": ".progit",
+    "puppeteer": ".puppeteer",
+    "python": ".python",
+    "ruff": ".ruff",
+    "ty": ".ty",
+    "typst": ".typst",
+    "uv": ".uv",
+    "whenever": ".whenever",
+    "xarray": ".xarray",
+    "zarr": ".zarr",
+    "zed": ".zed",
+    "zig": ".zig",
+} | {
+    tool_name: ".devdocs"
+    for tool_name in [
+        "bash",
+        "click",
+        "css",
+        "dom",
+        "git",
+        "homebrew",
+        "html",
+        "javascript",
+        "jq",
+        "numpy",
+        "pytorch",
+        "svelte",
+        "typescript",
+        "vite",
+        "vitest",
+        "zsh",
+    ]
+}
+
+
+class LazyGroup(click.Group):
+    """
+    A click.Group that imports a subcommand's module from lazy_commands the first
+    time the subcommand is looked up. The module adds its commands to the group
+    when it's imported, like before.
+    """
+
+    def list_commands(self, ctx) -> list[str]:
+        return sorted(set(super().list_commands(ctx)) | set(lazy_commands))
+
+    def get_command(self, ctx, cmd_name: str) -> click.Command | None:
+        if cmd_name not in self.commands and cmd_name in lazy_commands:
+            importlib.import_module(lazy_commands[cmd_name], __package__)
+        return super().get_command(ctx, cmd_name)
+
+    def format_commands(self, ctx, formatter):
+        # List the commands that haven't been imported without their help, instead
+        # of importing all of them for it
+        rows = []
+        for cmd_name in self.list_commands(ctx):
+            cmd = self.commands.get(cmd_name)
+            if cmd is None:
+                rows.append((cmd_name, ""))
+            elif not cmd.hidden:
+                rows.append((cmd_name, cmd.get_short_help_str(formatter.width // 2)))
+        with formatter.section("Commands"):
+            formatter.write_dl(rows)
+
+    def shell_complete(self, ctx, incomplete: str) -> list[CompletionItem]:
+        results = [
+            CompletionItem(cmd_name)
+            for cmd_name in self.list_commands(ctx)
+            if cmd_name.startswith(incomplete)
+        ]
+        # The options, skipping click.Group's own completion of subcommands
+        results.extend(click.Command.shell_complete(self, ctx, incomplete))
+        return results
+
+
+@click.group(cls=LazyGroup)
+@click.pass_context
+@click.option(
+    "--version-ttl",
+    type=int,
+    help="Seconds that resolved upstream versions are reused for, 0 to always re-resolve.  [default: 3600]",  # noqa: E501
+)
+@click.option(
+    "--force",
+    is_flag=True,
+    help="Rebuild documentation sets even if their inputs haven't changed.",
+)
+@click.option(
+    "--dedupe/--no-dedupe",
+    default=True,
+    show_default=True,
+    help="Remove paragraphs that repeat, or nearly repeat, earlier ones in the same documentation set.",  # noqa: E501
+)
+@click.option(
+    "--shard-tokens",
+    type=int,
+    help="Also split each txt that's over this many tokens into shards under site-build/shards, cut at headings.",  # noqa: E501
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Time every stage of every documentation set built and track its peak memory, writing a JSON report per set to scratchspace/profiles.",  # noqa: E501
+)
+@click.option(
+    "--profile-cprofile",
+    is_flag=True,
+    help="Like --profile, and also write a cProfile dump per stage. Stages that overlap another profiled stage in the same process go without.",  # noqa: E501
+)
+@click.option(
+    "--fetch-backend",
+    type=click.Choice(["tarball", "git"]),
+    default="tarball",
+    show_default=True,
+    help="How docs kept in github repos are fetched. git does a blobless partial clone with a sparse checkout of just the docs, reused across versions.",  # noqa: E501
+)
+def cli(
+    ctx,
+    version_ttl: int | None,
+    force: bool,
+    dedupe: bool,
+    shard_tokens: int | None,
+    profile: bool,
+    profile_cprofile: bool,
+    fetch_backend: str,
+):
+    if not Path("./.git").exists():
+        logging.error(
+            f"Must be called from the repo root! Being called from {Path.cwd()}"
+        )
+        sys.exit(1)
+
+    setup_logging()
+
+    if version_ttl is not None:
+        # Imported here since it loads httpx, which most invocations don't need
+        from . import versions
+
+        versions.ttl_seconds = version_ttl
+
+    ctx.ensure_object(dict)
+    ctx.obj["force"] = force
+    ctx.obj["dedupe"] = dedupe
+    ctx.obj["shard_tokens"] = shard_tokens
+    ctx.obj["fetch_backend"] = fetch_backend
+    if profile or profile_cprofile:
+        profiling.enable(ctx, cprofile=profile_cprofile)
 
     # Create all working directories so that other commands don't
     # have to worry about it.
     scratchspace = Path("scratchspace")
     site_build = Path("site-build")
     txts = site_build / "txts"
+    shards = site_build / "shards"
 
     scratchspace.mkdir(exist_ok=True)
     site_build.mkdir(exist_ok=True)
     txts.mkdir(exist_ok=True)
+    shards.mkdir(exist_ok=True)
 
     ctx.obj["scratchspace"] = scratchspace
+    workspace.scratchspace = scratchspace
     ctx.obj["site-build"] = site_build
     ctx.obj["txts"] = txts
+    ctx.obj["shards"] = shards
 
 
 @click.command
@@ -144,16 +619,19 @@ def build_site(ctx):
     <h1>Missing llms.txts</h1>
     <a href="https://github.com/abidsikder/llm-txts" target="_blank">GitHub</a>
     <p>
-    Each entry is "token_size txt_name". Token counts are estimated by dividing byte lengths by 4.
+    Each entry is "token_size txt_name (compressed_size)". Token counts are estimated by dividing byte lengths by 4. Every file is also available precompressed, e.g. txt_name.gz.
     </p>
     <p>We aim for &lt;800K tokens, but some docs are very large. Shortening them for LLM digestion is ongoing.</p>
     <p>Scroll to find licensing acknowledgments on this page.</p>
+    <p><a href="catalog.json">catalog.json</a> lists every file with its version, size, sha256, license and build time.</p>
+    <p><a href="search/index.json">search/index.json</a> is a full-text search index over every file, in shards of BM25 term postings per section that can be fetched on demand, with the byte range of each section for fetching just it.</p>
     <ul>
     """  # noqa: E501
     index_html.write(head)
 
     txts = ctx.obj["txts"]
-    txt_ps = list(itertools.chain(txts.rglob("*.txt"), txts.rglob("*.md")))
+    # One walk, the precompressed siblings are in there too
+    txt_ps = [p for p in txts.rglob("*") if p.suffix in {".txt", ".md"}]
     # go through things alphabetically so that the website has a list in an
     # alphabetical format
     txt_ps = sorted(txt_ps)
@@ -176,21 +654,78 @@ def build_site(ctx):
             head.append(txt_p)
     txt_ps = head + tail
 
+    site_build = ctx.obj["site-build"]
+    # Imported here since it imports this module
+    from . import search
+
+    logging.info("Updating the search index")
+    search_ps = search.build_index(
+        ctx, txt_ps, site_build / "search", ctx.obj["scratchspace"] / "search"
+    )
+
+    # Compress every file up front across the process pool, so the index can
+    # show what is actually downloaded
+    compress.remove_orphans(site_build)
+    shard_ps = sorted(
+        p
+        for p in ctx.obj["shards"].rglob("*")
+        if p.is_file() and p.suffix in {".txt", ".md", ".json"}
+    )
+    site_ps = txt_ps + shard_ps + search_ps
+    logging.info(f"Compressing {len(site_ps)} files")
+    compressed_sizes = dict(
+        zip(site_ps, cpu_map(ctx, compress.compress_file, site_ps), strict=True)
+    )
+
+    catalog_p = site_build / "catalog.json"
+    catalog_p.write_text(
+        json.dumps(build_catalog(txt_ps, ctx.obj["scratchspace"]), indent=2)
+    )
+    compress.compress_file(catalog_p)
+
+    def format_tokens(approx_tokens):
+        rounded = round(approx_tokens / 1000)
+        formatted = str(rounded).rjust(4, "-")
+        return formatted.replace("-", "&nbsp;")
+
+    def format_compressed(p):
+        size = compressed_sizes[p][".gz"]
+        if size >= 1000 * 1000:
+            return f"{size / (1000 * 1000):.1f}MB gzipped"
+        return f"{size / 1000:.0f}KB gzipped"
+
     for txt_p in txt_ps:
         size_bytes = txt_p.stat().st_size
         approx_tokens = (
             size_bytes / 4
         )  # rough approximation by dividing by 4 characters per token
-        rounded = round(approx_tokens / 1000)
-        formatted = str(rounded).rjust(4, "-")
-        formatted = formatted.replace("-", "&nbsp;")
+        formatted = format_tokens(approx_tokens)
 
         txt_name = txt_p.name
 
         # e.g. <li><a href="txts/python-3.13.5.txt" download>python-3.13.5.txt</a> ~ 2856K tokens</li> # noqa E501
-        tag = f'<li><code>{formatted}K</code> <a href="txts/{txt_name}" download>{txt_name}</a></li>'  # noqa E501
+        tag = f'<li><code>{formatted}K</code> <a href="txts/{txt_name}" download>{txt_name}</a> ({format_compressed(txt_p)})'  # noqa E501
         index_html.write(tag)
 
+        # List the shards under the txt they were split from, with the first
+        # heading of each
+        shards_dir = ctx.obj["shards"] / txt_name
+        shards_manifest_p = shards_dir / "manifest.json"
+        if shards_manifest_p.exists():
+            shards_manifest = json.loads(shards_manifest_p.read_text())
+            index_html.write("<ul>")
+            for shard in shards_manifest["shards"]:
+                shard_name = shard["file"]
+                first_heading = html.escape(next(iter(shard["headings"]), ""))
+                index_html.write(
+                    f'<li><code>{format_tokens(shard["tokens"])}K</code> <a href="shards/{txt_name}/{shard_name}" download>{shard_name}</a> ({format_compressed(shards_dir / shard_name)}) {first_heading}</li>'  # noqa E501
+                )
+            index_html.write(
+                f'<li><a href="shards/{txt_name}/manifest.json" download>manifest.json</a></li>'  # noqa E501
+            )
+            index_html.write("</ul>")
+        index_html.write("</li>")
+
     middle = """
     </ul>
     <h3>License Acknowledgments</h3>
@@ -212,8 +747,9 @@ def build_site(ctx):
     """
     index_html.write(foot)
 
-    site_build = ctx.obj["site-build"]
-    (site_build / "index.html").write_text(index_html.getvalue())
+    index_p = site_build / "index.html"
+    index_p.write_text(index_html.getvalue())
+    compress.compress_file(index_p)
     logging.info("Done with building website")
 
 
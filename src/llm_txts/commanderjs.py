@@ -1,15 +1,33 @@
 import io
 import logging
-import threading
+from pathlib import Path
 
 import click
-import httpx
 from bs4 import BeautifulSoup
 
-from .cli import cli, dl_tgz
-from .license_info import license_info
+from .builds import Build
+from .cli import cli, concurrently, make_text_maker, run_cpu
+from .profiling import stage
 
-license_info["commander.js"] = "MIT License"
+
+def convert(jsdocs_html_p: Path, encoding: str) -> str:
+    jsdocs_html = jsdocs_html_p.read_bytes().decode(encoding, errors="replace")
+    with stage(None, "parse"):
+        soup = BeautifulSoup(jsdocs_html, "lxml")
+    text_maker = make_text_maker()
+    converted = io.StringIO()
+    for section_h2_id in [
+        "variables",
+        "functions",
+        "classes",
+        "interfaces",
+        "type-aliases",
+    ]:
+        content_div = soup.find("h2", id=f"package-{section_h2_id}").find_parent(
+            "section"
+        )
+        converted.write(text_maker.handle(str(content_div)))
+    return converted.getvalue()
 
 
 @click.command
@@ -19,53 +37,35 @@ def commanderjs(ctx):
     scratchspace.mkdir(exist_ok=True)
 
     version = "14.0.0"
-    txt = io.StringIO()
-
-    def source_docs():
-        logging.info("Downloading source code docs for markdown help pages")
-        download_url = (
-            f"https://github.com/tj/commander.js/archive/refs/tags/v{version}.tar.gz"
-        )
-        dl_tgz(download_url, scratchspace)
-        extracted = scratchspace / f"commander.js-{version}"
-        for p in [
-            extracted / "README.md",
-            extracted / "docs" / "help-in-depth.md",
-            extracted / "docs" / "options-in-depth.md",
-            extracted / "docs" / "parsing-and-hooks.md",
-            extracted / "docs" / "terminology.md",
-        ]:
-            txt.write(p.read_text())
+    build = Build(ctx, version)
+    logging.info(
+        "Downloading source code docs for markdown help pages, and docs from jsdocs to get reference API build"  # noqa: E501
+    )
+    source, jsdocs_resp = concurrently(
+        lambda: build.fetch_source(
+            "tj/commander.js", f"v{version}", "README.md,docs/**.md"
+        ),
+        lambda: build.fetch("https://www.jsdocs.io/package/commander"),
+    )
+    if build.is_fresh():
+        return
 
-    def jsdocs():
-        logging.info("Downloading docs from jsdocs to get reference API build")
-        resp = httpx.get("https://www.jsdocs.io/package/commander")
-        soup = BeautifulSoup(resp.text, "lxml")
-        text_maker = ctx.obj["text_maker"]
-        for section_h2_id in [
-            "variables",
-            "functions",
-            "classes",
-            "interfaces",
-            "type-aliases",
-        ]:
-            content_div = soup.find("h2", id=f"package-{section_h2_id}").find_parent(
-                "section"
-            )
-            converted = text_maker.handle(str(content_div))
-            txt.write(converted)
-
-    source_docs_thread = threading.Thread(target=source_docs)
-    jsdocs_thread = threading.Thread(target=jsdocs)
-
-    source_docs_thread.start()
-    jsdocs_thread.start()
-
-    source_docs_thread.join()
-    jsdocs_thread.join()
+    txt = io.StringIO()
+    extracted = source.directory(scratchspace)
+    for p in [
+        extracted / "README.md",
+        extracted / "docs" / "help-in-depth.md",
+        extracted / "docs" / "options-in-depth.md",
+        extracted / "docs" / "parsing-and-hooks.md",
+        extracted / "docs" / "terminology.md",
+    ]:
+        txt.write(p.read_text())
+    txt.write(run_cpu(ctx, convert, jsdocs_resp.path, jsdocs_resp.encoding))
 
     txt_dest = ctx.obj["txts"] / f"commanderjs-{version}.md"
-    txt_dest.write_text(txt.getvalue())
+    with stage(ctx, "write"):
+        txt_dest.write_text(txt.getvalue())
+    build.done(txt_dest)
 
     logging.info(f"Done processing commanderjs {version}")
 
@@ -0,0 +1,55 @@
+"""
+Precompressed siblings of the site files, so that a host can serve e.g.
+python-3.13.5.txt.gz as is instead of compressing on the fly or not at all. Every
+file gets gzip, brotli and zstd siblings.
+"""
+
+import gzip
+import os
+from pathlib import Path
+
+import brotli
+import zstandard
+
+all_suffixes = [".gz", ".br", ".zst"]
+
+
+def compressors() -> dict:
+    """Suffix of each sibling and how to make it, at maximum compression."""
+    return {
+        # mtime=0 so that the same txt always gives the same bytes
+        ".gz": lambda data: gzip.compress(data, compresslevel=9, mtime=0),
+        ".br": lambda data: brotli.compress(data, quality=11),
+        ".zst": zstandard.ZstdCompressor(level=22).compress,
+    }
+
+
+def compress_file(p: Path) -> dict[str, int]:
+    """
+    Write the compressed siblings of p and give back their sizes by suffix.
+    Siblings are given p's mtime, and ones that already have it are up to date and
+    left alone.
+    """
+    st = p.stat()
+    sizes = {}
+    data = None
+    for suffix, compress in compressors().items():
+        sibling = p.with_name(p.name + suffix)
+        if sibling.exists() and sibling.stat().st_mtime_ns == st.st_mtime_ns:
+            sizes[suffix] = sibling.stat().st_size
+            continue
+        if data is None:
+            data = p.read_bytes()
+        compressed = compress(data)
+        sibling.write_bytes(compressed)
+        os.utime(sibling, ns=(st.st_atime_ns, st.st_mtime_ns))
+        sizes[suffix] = len(compressed)
+    return sizes
+
+
+def remove_orphans(site_build: Path):
+    """Remove siblings whose file is gone, e.g. the txt of an older version."""
+    for suffix in all_suffixes:
+        for sibling in site_build.rglob(f"*{suffix}"):
+            if not sibling.with_name(sibling.name.removesuffix(suffix)).exists():
+                sibling.unlink()
@@ -0,0 +1,143 @@
+"""
+Post-conversion dedupe. Generated docs repeat the same paragraphs over and over
+(parameter blurbs, notes copied into every section), so blocks of text that are
+exact or near duplicates of an earlier block are removed, keeping the first.
+Code is never removed: neither indented blocks nor any block that opens, closes
+or is inside a ``` or ~~~ fence, since a missing fence would swap code and prose
+for the rest of the file.
+
+Near duplicates are found with bottom-k MinHash sketches over word shingles: each
+kept block is indexed by its sketch, and a new block is only compared against the
+kept blocks that share enough of its sketch.
+"""
+
+import hashlib
+import itertools
+import logging
+import re
+import zlib
+from collections import Counter
+from pathlib import Path
+
+# Words per shingle
+SHINGLE_WORDS = 5
+# Number of smallest shingle hashes kept as a block's sketch
+SKETCH_SIZE = 64
+# Estimated jaccard similarity from which a block counts as a near duplicate
+SIMILARITY = 0.9
+# Shorter blocks (headings, parameter names, "Returns") are structure, not repeats
+MIN_WORDS = 12
+# Sketch hashes shared by more kept blocks than this aren't used to find candidates
+MAX_POSTINGS = 32
+# Kept blocks sharing the most of a block's sketch that it is compared against
+MAX_CANDIDATES = 8
+
+# Blocks are separated by blank lines, the separators are kept as is
+block_sep_re = re.compile(r"(\n[ \t]*\n+)")
+word_re = re.compile(r"\w+")
+# Like shards.fence_re
+fence_re = re.compile(r" {0,3}(```|~~~)")
+
+
+def is_code(block: str) -> bool:
+    """Indented code, where dropping a piece would break the example."""
+    return all(
+        line.startswith(("    ", "\t")) for line in block.splitlines() if line.strip()
+    )
+
+
+def sketch(words: list[str]) -> list[int]:
+    # crc32 rather than hash(), which changes between runs and would make the
+    # output unstable
+    shingles = {
+        zlib.crc32(" ".join(words[i : i + SHINGLE_WORDS]).encode())
+        for i in range(max(1, len(words) - SHINGLE_WORDS + 1))
+    }
+    return sorted(shingles)[:SKETCH_SIZE]
+
+
+def similarity(a: list[int], b: list[int]) -> float:
+    """Estimate the jaccard similarity of the blocks two sketches came from."""
+    a_set, b_set = set(a), set(b)
+    union = sorted(a_set | b_set)[:SKETCH_SIZE]
+    both = sum(1 for h in union if h in a_set and h in b_set)
+    return both / len(union)
+
+
+class Index:
+    """The blocks kept so far, shared across files to dedupe them together."""
+
+    def __init__(self):
+        self.exact: set[bytes] = set()
+        self.sketches: list[list[int]] = []
+        self.postings: dict[int, list[int]] = {}
+
+    def is_duplicate(self, block: str) -> bool:
+        """True if block repeats a kept one, otherwise keep it."""
+        if is_code(block):
+            return False
+        words = word_re.findall(block.lower())
+        if len(words) < MIN_WORDS:
+            return False
+        key = hashlib.blake2b(" ".join(words).encode(), digest_size=16).digest()
+        if key in self.exact:
+            return True
+
+        block_sketch = sketch(words)
+        postings = self.postings
+        shared = Counter(
+            itertools.chain.from_iterable(
+                postings[h] for h in block_sketch if h in postings
+            )
+        ).most_common(MAX_CANDIDATES)
+        needed = len(block_sketch) * SIMILARITY / 2
+        for i, count in shared:
+            if count < needed:
+                break
+            if similarity(block_sketch, self.sketches[i]) >= SIMILARITY:
+                return True
+
+        self.exact.add(key)
+        i = len(self.sketches)
+        self.sketches.append(block_sketch)
+        for h in block_sketch:
+            posting = self.postings.setdefault(h, [])
+            if len(posting) < MAX_POSTINGS:
+                posting.append(i)
+        return False
+
+
+def dedupe_text(text: str, index: Index) -> str:
+    parts = block_sep_re.split(text)
+    kept = []
+    in_fence = False
+    # parts alternates between blocks and the separators after them
+    for i in range(0, len(parts), 2):
+        fences = sum(1 for line in parts[i].splitlines() if fence_re.match(line))
+        if in_fence or fences > 0 or not index.is_duplicate(parts[i]):
+            kept.append(parts[i])
+            if i + 1 < len(parts):
+                kept.append(parts[i + 1])
+        if fences % 2 == 1:
+            in_fence = not in_fence
+    return "".join(kept)
+
+
+def dedupe_files(paths: list[Path]):
+    """Dedupe paths in place, in order, each against itself and the ones before."""
+    index = Index()
+    for p in paths:
+        text = p.read_text()
+        deduped = dedupe_text(text, index)
+        if len(deduped) == len(text):
+            continue
+        logging.info(
+            f"Removed {len(text) - len(deduped)} characters of repeated text from {p}"
+        )
+        # A new file instead of writing in place, p may be a hardlink to a blob
+        p.unlink()
+        p.write_text(deduped)
+
+
+def dedupe_file(p: Path):
+    dedupe_files([p])
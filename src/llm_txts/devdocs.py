@@ -2,30 +2,153 @@
 For all documentation sets derived from devdocs.io
 """
 
+import functools
+import itertools
 import json
 import logging
 import shutil
-import tempfile
+from collections.abc import Iterator
 from pathlib import Path
 
 import click
-import httpx
-from bs4 import BeautifulSoup
 
-from .cli import cli, collect, common_soup_clean, dl_tgz
-from .license_info import license_info
-
-
-def dl_devdocs(slug: str, dest: Path):
-    """Download and extract a .tar.gz file from devdocs"""
-    dl_tgz(f"https://downloads.devdocs.io/{slug}.tar.gz", dest)
+from .builds import Build
+from .cleanup import (
+    DROP_WITH_NEXT,
+    Rule,
+    Rules,
+    common_rules,
+    html_blocks,
+    parse,
+    select,
+)
+from .cli import (
+    build_all_variants,
+    cli,
+    collected_paths,
+    collected_text,
+    cpu_map,
+    extract_tgz,
+    iter_collected,
+    lazy_commands,
+    make_text_maker,
+    run_cpu,
+    write_markdown,
+)
+from .profiling import stage
+from .versions import devdocs_catalog
+
+
+def collected_html_paths(tool_name: str, download_dir: Path) -> list[Path]:
+    """The html pages of a devdocs set that go into the txt, in order."""
+    match tool_name:
+        case "numpy":
+            return collected_paths(
+                "user/**.html,reference/**.html",
+                download_dir,
+                exclude="reference/c-api/**.html,reference/distutils/**.html,reference/distutils*.html",
+            )
+        case "javascript":
+            return collected_paths(
+                "**.html",
+                download_dir,
+                exclude="global_objects/**.html",
+            ) + collected_paths("global_objects/*.html", download_dir)
+        case "css":
+            return collected_paths("*.html", download_dir, exclude="*/**")
+        case "dom":
+            # Don't collect the WebXR api or its other features, it is
+            # not well supported
+            return collected_paths(
+                "*.html", download_dir, exclude="*/**,webxr*.html,xr*.html"
+            )
+        case _:
+            return collected_paths("**.html", download_dir)
+
+
+# Clean up browser compatibility information from dom/html/css to reduce total size
+compat_rules = [
+    Rule("details.baseline-indicator"),
+    Rule("h2#specifications", DROP_WITH_NEXT, next="div._table"),
+    Rule("h2#browser_compatibility", DROP_WITH_NEXT, next="div._table"),
+]
+
+# What gets removed from specific sets, on top of the devdocs attribution and the
+# common rules
+tool_rules: dict[str, list[Rule]] = {
+    "dom": compat_rules
+    + [
+        Rule("h2#see_also", DROP_WITH_NEXT, next="div.section-content"),
+        Rule("div.experimental"),
+    ],
+    "html": compat_rules,
+    "javascript": compat_rules,
+    "css": compat_rules
+    + [
+        Rule('section[aria-labelledby="formal_syntax"]'),
+        Rule('section[aria-labelledby="formal_definition"]'),
+        Rule('section[aria-labelledby="see_also"]'),
+    ],
+}
+
+
+@functools.cache
+def rules(tool_name: str) -> Rules:
+    return Rules(
+        [Rule("div._attribution")], tool_rules.get(tool_name, []), common_rules
+    )
+
+
+def clean(tool_name: str, page: str) -> Iterator[str]:
+    """
+    Remove the parts of a devdocs page that aren't worth the context, giving back
+    its html in blocks (see html_blocks).
+    """
+    with stage(None, "parse"):
+        root = parse(page)
+    # Only collect non-deprecated features
+    if tool_name == "dom" and select(root, "div.notecard.deprecated"):
+        return iter(())
+    with stage(None, "cleanup"):
+        rules(tool_name).apply(root)
+    return html_blocks(root)
+
+
+def convert(tool_name: str, html_ps: list[Path], txt_dest: Path):
+    """Clean up the collected html of a devdocs set and convert it to markdown."""
+    cleaned = (
+        block for page in iter_collected(html_ps) for block in clean(tool_name, page)
+    )
+    with txt_dest.open(mode="w") as f:
+        write_markdown(cleaned, f)
+
+
+def convert_page(tool_name: str, html_p: Path) -> str:
+    """convert for a single page, used by --per-page and --stream."""
+    page = collected_text(html_p.read_bytes())
+    if page is None:
+        return ""
+    cleaned = "".join(clean(tool_name, page))
+    if not cleaned:
+        return ""
+    return make_text_maker().handle(cleaned)
 
 
 def devdocs(tool_name: str):
     @click.command(name=tool_name)
     @click.option("--version", help="Has to match the version available on devdocs.io.")
+    @click.option(
+        "--per-page",
+        is_flag=True,
+        help="Clean and convert each page separately across a process pool.",
+    )
+    @click.option(
+        "--stream",
+        is_flag=True,
+        help="Convert one page at a time in this process to keep memory use at about the largest page.",  # noqa: E501
+    )
     @click.pass_context
-    def f(ctx, version: str | None):
+    def f(ctx, version: str | None, per_page: bool, stream: bool):
         scratchspace = ctx.obj["scratchspace"] / tool_name
         scratchspace.mkdir(exist_ok=True)
 
@@ -38,20 +161,22 @@ def devdocs(tool_name: str):
             logging.info(
                 f"Need to find latest version for {tool_name}, finding list of all available versions"  # noqa E501
             )
-            list_of_all_docs = json.loads(
-                httpx.get("https://devdocs.io/docs/docs.json").text
-            )
             versions = []
-            for d in list_of_all_docs:
+            for d in devdocs_catalog():
                 if tool_name in d["slug"]:
                     versions.append(d["version"])
             latest_version = sorted(versions)[-1]
             slug = slug + "~" + latest_version
 
         logging.info(f"Downloading {slug} docs from devdocs")
+        build = Build(ctx, slug)
+        resp = build.fetch(f"https://downloads.devdocs.io/{slug}.tar.gz")
+        if build.is_fresh():
+            return
+
         version: str = "latest"
         download_dir = scratchspace / version
-        dl_devdocs(slug, download_dir)
+        extract_tgz(resp.path, download_dir)
 
         meta_info = json.loads((download_dir / "meta.json").read_text())
         if "release" in meta_info:
@@ -66,158 +191,33 @@ def devdocs(tool_name: str):
 
         logging.info("Cleaning up html and parsing it into a collated txt")
         txt_dest = ctx.obj["txts"] / f"{tool_name}-{version}.md"
-        with tempfile.NamedTemporaryFile(mode="w+", delete=True, suffix=".html") as fp:
-            collected_html_p = Path(fp.name)
-            match tool_name:
-                case "numpy":
-                    collect(
-                        "user/**.html,reference/**.html",
-                        download_dir,
-                        collected_html_p,
-                        exclude="reference/c-api/**.html,reference/distutils/**.html,reference/distutils*.html",
-                    )
-                case "javascript":
-                    collect(
-                        "**.html",
-                        download_dir,
-                        collected_html_p,
-                        exclude="global_objects/**.html",
-                    )
-                    with tempfile.NamedTemporaryFile(
-                        mode="w+", delete=True, suffix=".html"
-                    ) as fp2:
-                        collected_html_p2 = Path(fp2.name)
-                        collect(
-                            "global_objects/*.html",
-                            download_dir,
-                            collected_html_p2,
-                        )
-                        fp.write(collected_html_p2.read_text())
-                case "css":
-                    for p in download_dir.glob("*.html"):
-                        if p.is_file():
-                            fp.write(p.read_text())
-                case "dom":
-                    for p in download_dir.glob("*.html"):
-                        if not p.is_file():
-                            continue
-                        # Don't collect the WebXR api or its other features, it is
-                        # not well supported
-                        if p.name.startswith("webxr") or p.name.startswith("xr"):
-                            continue
-
-                        # Only collect non-deprecated features
-                        soup = BeautifulSoup(p.read_text(), "lxml")
-                        if not soup.select_one("div.notecard.deprecated"):
-                            fp.write(p.read_text())
-                case _:
-                    collect("**.html", download_dir, collected_html_p)
-
-            soup = BeautifulSoup(collected_html_p.read_text(), "lxml")
-
-            # Clean up the context by removing unnecessary information
-            for elem in soup.find_all("div", class_="_attribution"):
-                elem.decompose()
-            # Clean up browser compatibility information from dom/html/css to
-            # reduce total size
-            match tool_name:
-                case "dom" | "html" | "css" | "javascript":
-                    for elem in soup.find_all("details", class_="baseline-indicator"):
-                        elem.decompose()
-                    for elem in soup.select("h2#specifications + div._table"):
-                        elem.decompose()
-                    for elem in soup.find_all(
-                        "h2", id="specifications"
-                    ):  # the above doesn't destroy the h2 itself for some reason...
-                        elem.decompose()
-                    for elem in soup.select("h2#browser_compatibility + div._table"):
-                        elem.decompose()
-                    for elem in soup.find_all("h2", id="browser_compatibility"):
-                        elem.decompose()
-            match tool_name:
-                case "css":
-                    for elem in soup.find_all(
-                        "section", attrs={"aria-labelledby": "formal_syntax"}
-                    ):
-                        elem.decompose()
-                    for elem in soup.find_all(
-                        "section", attrs={"aria-labelledby": "formal_definition"}
-                    ):
-                        elem.decompose()
-                    for elem in soup.find_all(
-                        "section", attrs={"aria-labelledby": "see_also"}
-                    ):
-                        elem.decompose()
-                case "dom":
-                    for elem in soup.select("h2#see_also + div.section-content"):
-                        elem.decompose()
-                    for elem in soup.find_all("h2", id="see_also"):
-                        elem.decompose()
-                    for elem in soup.find_all("div", class_="experimental"):
-                        elem.decompose()
-
-            common_soup_clean(soup)
-
-            text_maker = ctx.obj["text_maker"]
-            converted = text_maker.handle(str(soup))
+        html_ps = collected_html_paths(tool_name, download_dir)
+        # Both page by page modes append each page's markdown as soon as it's
+        # ready instead of holding the whole set in memory
+        if stream:
+            with txt_dest.open(mode="w") as f:
+                for html_p in html_ps:
+                    f.write(convert_page(tool_name, html_p))
+        elif per_page:
             with txt_dest.open(mode="w") as f:
-                f.write(converted)
+                f.writelines(
+                    cpu_map(ctx, convert_page, itertools.repeat(tool_name), html_ps)
+                )
+        else:
+            run_cpu(ctx, convert, tool_name, html_ps, txt_dest)
+        build.release = version
+        build.done(txt_dest)
 
         logging.info(f"Done processing {tool_name} {version}")
 
     return f
 
 
-license_info["dom / Web APIs"] = (
-    "Creative Commons Attribution-ShareAlike License v2.5 or later"
-)
-cli.add_command(devdocs("dom"))
-
-license_info["css"] = "Creative Commons Attribution-ShareAlike License v2.5 or later"
-cli.add_command(devdocs("css"))
-
-license_info["html"] = "Creative Commons Attribution-ShareAlike License v2.5 or later"
-cli.add_command(devdocs("html"))
-
-license_info["javascript"] = (
-    "Creative Commons Attribution-ShareAlike License v2.5 or later"
-)
-cli.add_command(devdocs("javascript"))
-
-license_info["typescript"] = "Apache License, Version 2.0"
-cli.add_command(devdocs("typescript"))
-
-license_info["svelte"] = "MIT License"
-cli.add_command(devdocs("svelte"))
-
-license_info["vite"] = "MIT License"
-cli.add_command(devdocs("vite"))
-
-license_info["vitest"] = "MIT License"
-cli.add_command(devdocs("vitest"))
-
-license_info["git"] = "GPLv2"
-cli.add_command(devdocs("git"))
-
-license_info["bash"] = "GNU Free Documentation License"
-cli.add_command(devdocs("bash"))
-
-license_info["zsh"] = "MIT License"
-cli.add_command(devdocs("zsh"))
-
-license_info["homebrew"] = "BSD 2-Clause License"
-cli.add_command(devdocs("homebrew"))
-
-license_info["jq"] = "Creative Commons Attribution 3.0 license"
-cli.add_command(devdocs("jq"))
-
-license_info["numpy"] = "3-clause BSD License"
-cli.add_command(devdocs("numpy"))
-
-license_info["pytorch"] = (
-    "the pytorch BSD-like license https://github.com/pytorch/pytorch/blob/main/LICENSE"
-)
-cli.add_command(devdocs("pytorch"))
+# The sets are listed in the cli's lazy_commands
+for tool_name, module in lazy_commands.items():
+    if module == ".devdocs":
+        cli.add_command(devdocs(tool_name))
 
-license_info["click"] = "BSD 3-Clause License"
-cli.add_command(devdocs("click"))
+# The largest sets, which are worth spreading across processes page by page
+for tool_name in ["dom", "javascript", "numpy", "pytorch"]:
+    build_all_variants[tool_name] = [["--per-page"]]
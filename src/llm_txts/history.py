@@ -0,0 +1,214 @@
+"""
+History of documentation set builds, in a SQLite database in scratchspace. Every
+build adds a row with its wall and CPU time, peak RSS, bytes downloaded, output
+size and token estimate, including builds that were skipped as up to date. The
+history command shows how those trend and flags the builds that regressed
+compared to the rolling median of the builds before them.
+
+Peak RSS is that of the build's biggest call on the process pool under build-all,
+where the process's own only ever goes up across builds. When a command is run on
+its own it's the larger of that and the process's own.
+"""
+
+import contextlib
+import datetime
+import sqlite3
+import statistics
+import sys
+from pathlib import Path
+
+import click
+
+from .cli import cli
+
+schema = """
+create table if not exists builds (
+    id integer primary key,
+    name text not null,
+    version text not null,
+    started_at real not null,
+    wall_s real not null,
+    cpu_s real not null,
+    peak_rss_bytes integer not null,
+    downloaded_bytes integer not null,
+    output_bytes integer not null,
+    tokens integer not null,
+    -- 1 if the build was skipped since its outputs were up to date
+    fresh integer not null
+);
+create index if not exists builds_name on builds (name, started_at);
+"""
+
+# The metrics a build can regress in, and what they're shown as
+regression_metrics = {
+    "wall_s": "wall",
+    "cpu_s": "cpu",
+    "peak_rss_bytes": "rss",
+    "output_bytes": "output",
+}
+
+# Number of earlier builds there have to be for a build to be compared to them
+MIN_BASELINE = 3
+
+
+@contextlib.contextmanager
+def connect(scratchspace: Path):
+    history_p = scratchspace / "history.sqlite"
+    history_p.parent.mkdir(exist_ok=True)
+    # Builds finishing at the same time wait for each other's writes
+    with contextlib.closing(sqlite3.connect(history_p, timeout=60)) as db:
+        db.row_factory = sqlite3.Row
+        db.executescript(schema)
+        with db:
+            yield db
+
+
+def record(
+    scratchspace: Path,
+    name: str,
+    version: str,
+    started_at: float,
+    wall_s: float,
+    cpu_s: float,
+    peak_rss_bytes: int,
+    downloaded_bytes: int,
+    output_bytes: int,
+    tokens: int,
+    fresh: bool,
+):
+    with connect(scratchspace) as db:
+        db.execute(
+            "insert into builds (name, version, started_at, wall_s, cpu_s, "
+            "peak_rss_bytes, downloaded_bytes, output_bytes, tokens, fresh) "
+            "values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                name,
+                version,
+                started_at,
+                wall_s,
+                cpu_s,
+                peak_rss_bytes,
+                downloaded_bytes,
+                output_bytes,
+                tokens,
+                int(fresh),
+            ),
+        )
+
+
+def regressions(
+    builds: list[sqlite3.Row], window: int, threshold: float
+) -> list[dict[str, float]]:
+    """
+    For each of a documentation set's builds, oldest first, the metrics it's over
+    threshold times the median of the window builds before it in, by how many
+    times. Skipped builds aren't compared or compared to.
+    """
+    flags = []
+    baseline: list[sqlite3.Row] = []
+    for build in builds:
+        flagged = {}
+        if not build["fresh"]:
+            if len(baseline) >= MIN_BASELINE:
+                for metric in regression_metrics:
+                    median = statistics.median(b[metric] for b in baseline[-window:])
+                    if median > 0 and build[metric] > threshold * median:
+                        flagged[metric] = build[metric] / median
+            baseline.append(build)
+        flags.append(flagged)
+    return flags
+
+
+def format_bytes(n: int) -> str:
+    if n >= 1000 * 1000:
+        return f"{n / (1000 * 1000):.1f}MB"
+    return f"{n / 1000:.0f}KB"
+
+
+def format_build(build: sqlite3.Row, flagged: dict[str, float]) -> str:
+    started_at = datetime.datetime.fromtimestamp(build["started_at"])
+    line = f"  {started_at:%Y-%m-%d %H:%M}  {build['version']:<12}"
+    line += f" {build['wall_s']:>8.1f}s {build['cpu_s']:>8.1f}s"
+    line += f" {format_bytes(build['peak_rss_bytes']):>8}"
+    line += f" {format_bytes(build['downloaded_bytes']):>8}"
+    line += f" {format_bytes(build['output_bytes']):>8}"
+    line += f" {round(build['tokens'] / 1000):>6}K"
+    if build["fresh"]:
+        line += "  up to date"
+    if len(flagged) > 0:
+        line += "  REGRESSED " + ", ".join(
+            f"{regression_metrics[metric]} {ratio:.1f}x"
+            for metric, ratio in flagged.items()
+        )
+    return line
+
+
+@click.command
+@click.pass_context
+@click.argument("doc-sets", nargs=-1)
+@click.option(
+    "--runs",
+    default=10,
+    show_default=True,
+    help="Number of most recent builds shown per documentation set.",
+)
+@click.option(
+    "--window",
+    default=10,
+    show_default=True,
+    help="Number of earlier builds that the rolling median is taken over.",
+)
+@click.option(
+    "--threshold",
+    default=1.5,
+    show_default=True,
+    help="Flag builds whose wall time, CPU time, peak RSS or output size is over this many times the rolling median.",  # noqa: E501
+)
+@click.option(
+    "--check",
+    is_flag=True,
+    help="Exit with status 1 if the latest build of any documentation set shown regressed, e.g. at the end of a nightly job.",  # noqa: E501
+)
+def history(
+    ctx,
+    doc_sets: tuple[str, ...],
+    runs: int,
+    window: int,
+    threshold: float,
+    check: bool,
+):
+    """
+    Show the recent builds of each documentation set, or of just the given ones
+    (e.g. python, or "python 3.13"), with the builds that regressed flagged.
+    """
+    with connect(ctx.obj["scratchspace"]) as db:
+        rows = db.execute("select * from builds order by name, started_at").fetchall()
+    by_name: dict[str, list[sqlite3.Row]] = {}
+    for row in rows:
+        by_name.setdefault(row["name"], []).append(row)
+
+    regressed = []
+    for name, builds in by_name.items():
+        if len(doc_sets) > 0 and not any(
+            name == d or name.startswith(d + " ") for d in doc_sets
+        ):
+            continue
+        flags = regressions(builds, window, threshold)
+        click.echo(name)
+        click.echo(
+            f"  {'started':<16}  {'version':<12} {'wall':>9} {'cpu':>9}"
+            f" {'peak rss':>8} {'download':>8} {'output':>8} {'tokens':>7}"
+        )
+        for build, flagged in list(zip(builds, flags, strict=True))[-runs:]:
+            click.echo(format_build(build, flagged))
+        built = [f for b, f in zip(builds, flags, strict=True) if not b["fresh"]]
+        if len(built) > 0 and len(built[-1]) > 0:
+            regressed.append(name)
+
+    if len(regressed) > 0:
+        click.echo(f"\nLatest build regressed: {', '.join(regressed)}")
+        if check:
+            sys.exit(1)
+
+
+cli.add_command(history)
@@ -0,0 +1,470 @@
+"""
+On disk cache for everything fetched from upstream. Cached bodies are revalidated
+with If-None-Match/If-Modified-Since, so a 304 serves the body from disk and
+unchanged upstreams transfer almost nothing. Bodies are kept in the blob store, so
+urls with the same content share it.
+
+Downloads are written to a .part file first. When one fails partway it's retried
+with exponential backoff, picking up where it left off with a Range request if
+upstream supports them, and from scratch if not. Parts of responses with a
+Content-Encoding (e.g. gzip) start over too: they're kept decoded, and ranges are of
+the encoded body.
+
+Requests go through one shared httpx client, so connections (and TLS sessions) to
+github.com, python.org and so on are kept alive and reused across every command
+of a run.
+"""
+
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import re
+import subprocess
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import click
+import httpx
+
+from . import blobs, workspace
+
+# Size of the chunks downloads are streamed to disk in
+CHUNK_SIZE = 1024 * 1024
+
+# Times a failed download is retried, waiting BACKOFF_SECONDS before the first
+# retry and twice as long before each one after, up to MAX_BACKOFF_SECONDS
+RETRIES = 5
+BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 30.0
+
+# Statuses worth retrying, besides connection errors and timeouts
+retry_statuses = {408, 429, 500, 502, 503, 504}
+
+# curl's exit status when upstream ignored the Range of -C
+CURL_RANGE_ERROR = 33
+
+# Concurrent fetches of the same url (e.g. the python.org ftp index under build-all)
+# wait on each other instead of racing to write the same cache entry.
+url_locks_lock = threading.Lock()
+url_locks: defaultdict[str, threading.Lock] = defaultdict(threading.Lock)
+
+# Connections the shared client keeps open in total, and that are in use at once
+# to any one host, so that build-all doesn't open dozens to github.com at a time
+MAX_CONNECTIONS = 64
+MAX_CONNECTIONS_PER_HOST = 6
+
+shared_client_lock = threading.Lock()
+shared_client: httpx.Client | None = None
+
+host_slots_lock = threading.Lock()
+host_slots: defaultdict[str, threading.BoundedSemaphore] = defaultdict(
+    lambda: threading.BoundedSemaphore(MAX_CONNECTIONS_PER_HOST)
+)
+
+# Upstream url prefixes and what to replace them with when fetching, e.g. to fetch
+# from the local stand-in the benchmarks serve. Cache entries stay keyed by the
+# upstream url.
+url_rewrites: dict[str, str] = dict()
+
+
+def cache_dir() -> Path:
+    return workspace.scratchspace / "http-cache"
+
+
+def rewritten(url: str) -> str:
+    for prefix, replacement in url_rewrites.items():
+        if url.startswith(prefix):
+            return replacement + url[len(prefix) :]
+    return url
+
+
+@dataclass
+class CachedResponse:
+    url: str
+    # Where the response body is stored on disk, which is read-only
+    path: Path
+    sha256: str
+    encoding: str
+    # True if upstream answered 304 and the body was served from disk
+    not_modified: bool
+    # Body bytes transferred for this fetch, 0 when it was served from disk
+    downloaded_bytes: int = 0
+
+    def read_bytes(self) -> bytes:
+        return self.path.read_bytes()
+
+    def read_text(self) -> str:
+        return self.path.read_bytes().decode(self.encoding, errors="replace")
+
+
+def client() -> httpx.Client:
+    """
+    The shared client, created on first use, speaking HTTP/2 to the upstreams that
+    do. It's closed when the cli group's context closes.
+    """
+    global shared_client
+    with shared_client_lock:
+        if shared_client is None:
+            shared_client = httpx.Client(
+                http2=True,
+                limits=httpx.Limits(
+                    max_connections=MAX_CONNECTIONS,
+                    max_keepalive_connections=MAX_CONNECTIONS,
+                ),
+            )
+            ctx = click.get_current_context(silent=True)
+            if ctx is not None:
+                ctx.find_root().call_on_close(close_client)
+        return shared_client
+
+
+def close_client():
+    global shared_client
+    with shared_client_lock:
+        if shared_client is not None:
+            shared_client.close()
+            shared_client = None
+
+
+@contextlib.contextmanager
+def host_slot(url: str):
+    """Wait for one of the connections to url's host to be free."""
+    with host_slots_lock:
+        slot = host_slots[urlsplit(url).netloc]
+    with slot:
+        yield
+
+
+def entry_paths(url: str) -> tuple[Path, Path]:
+    """The cache entry's metadata, and where its body was kept before the blob
+    store."""
+    key = hashlib.sha256(url.encode()).hexdigest()
+    return cache_dir() / f"{key}.json", cache_dir() / f"{key}.body"
+
+
+def part_paths(url: str) -> tuple[Path, Path]:
+    """A download in progress, and the response headers it's resumable with."""
+    meta_p, _ = entry_paths(url)
+    return meta_p.with_suffix(".part"), meta_p.with_suffix(".part.json")
+
+
+def remove_part(url: str):
+    for p in part_paths(url):
+        p.unlink(missing_ok=True)
+
+
+def read_meta(url: str) -> dict | None:
+    meta_p, legacy_body_p = entry_paths(url)
+    if not meta_p.exists():
+        return None
+    meta = json.loads(meta_p.read_text())
+    if meta["url"] != url:
+        return None
+    if not blobs.blob_path(meta["sha256"]).exists():
+        if not legacy_body_p.exists():
+            return None
+        blobs.add_file(legacy_body_p, meta["sha256"])
+    return meta
+
+
+def cached_sha256s() -> set[str]:
+    """The blobs that the cache entries' bodies are in."""
+    return {
+        json.loads(p.read_text())["sha256"]
+        for p in cache_dir().glob("*.json")
+        if not p.name.endswith(".part.json")
+    }
+
+
+def conditional_headers(meta: dict | None) -> dict[str, str]:
+    headers = {}
+    if meta is None:
+        return headers
+    if meta.get("etag") is not None:
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified") is not None:
+        headers["If-Modified-Since"] = meta["last_modified"]
+    return headers
+
+
+def cached_response(
+    url: str, meta: dict, not_modified: bool, downloaded_bytes=0
+) -> CachedResponse:
+    return CachedResponse(
+        url=url,
+        path=blobs.blob_path(meta["sha256"]),
+        sha256=meta["sha256"],
+        encoding=meta["encoding"],
+        not_modified=not_modified,
+        downloaded_bytes=downloaded_bytes,
+    )
+
+
+def write_atomic(dest: Path, write):
+    """Call write on a temporary file next to dest, then move it into place."""
+    with tempfile.NamedTemporaryFile(dir=dest.parent, delete=False) as f:
+        tmp_p = Path(f.name)
+        try:
+            write(f)
+        except BaseException:
+            f.close()
+            tmp_p.unlink()
+            raise
+    os.replace(tmp_p, dest)
+
+
+def validators(url: str, headers: httpx.Headers, encoding: str) -> dict:
+    return {
+        "url": url,
+        "etag": headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified"),
+        "encoding": encoding,
+    }
+
+
+def write_meta(url: str, headers: httpx.Headers, encoding: str, sha256: str) -> dict:
+    meta_p, _ = entry_paths(url)
+    meta = validators(url, headers, encoding) | {"sha256": sha256}
+    write_atomic(meta_p, lambda f: f.write(json.dumps(meta).encode()))
+    return meta
+
+
+def is_encoded(headers: httpx.Headers) -> bool:
+    return headers.get("Content-Encoding", "identity") != "identity"
+
+
+def resume_headers(url: str) -> tuple[int, dict[str, str]]:
+    """
+    Where to resume the download of url from and the headers to ask for the rest
+    with. Only resumable when the part was downloaded with a strong validator, so
+    that If-Range gets the whole body again if upstream changed since, and wasn't
+    encoded, since the part's size is then that of the decoded body.
+    """
+    part_p, part_meta_p = part_paths(url)
+    if not part_p.exists() or not part_meta_p.exists():
+        return 0, {}
+    part_meta = json.loads(part_meta_p.read_text())
+    validator = part_meta.get("etag") or part_meta.get("last_modified")
+    if part_meta["url"] != url or validator is None or validator.startswith("W/"):
+        return 0, {}
+    if part_meta.get("encoded", True):
+        return 0, {}
+    size = part_p.stat().st_size
+    if size == 0:
+        return 0, {}
+    return size, {
+        "Range": f"bytes={size}-",
+        "If-Range": validator,
+        # So that the rest isn't encoded either
+        "Accept-Encoding": "identity",
+    }
+
+
+def range_start(resp: httpx.Response) -> int | None:
+    m = re.match(r"bytes (\d+)-", resp.headers.get("Content-Range", ""))
+    return int(m[1]) if m is not None else None
+
+
+class PartMismatch(Exception):
+    """The part left by an earlier attempt doesn't line up with what upstream has
+    now."""
+
+
+def download(url: str, follow_redirects: bool) -> CachedResponse:
+    """One attempt at fetch, resuming the part left by an earlier one if possible."""
+    try:
+        return download_part(url, follow_redirects)
+    except PartMismatch:
+        # Started over only now that the host slot and the response are released
+        remove_part(url)
+        return download_part(url, follow_redirects)
+    except httpx.DecodingError:
+        # Whatever got into the part can't be resumed from
+        remove_part(url)
+        raise
+
+
+def download_part(url: str, follow_redirects: bool) -> CachedResponse:
+    meta = read_meta(url)
+    part_p, part_meta_p = part_paths(url)
+    resume_from, headers = resume_headers(url)
+    request_url = rewritten(url)
+    with (
+        host_slot(request_url),
+        client().stream(
+            "GET",
+            request_url,
+            headers=conditional_headers(meta) | headers,
+            follow_redirects=follow_redirects,
+        ) as resp,
+    ):
+        if resp.status_code == 304 and meta is not None:
+            remove_part(url)
+            return cached_response(url, meta, not_modified=True)
+        if resume_from > 0 and (
+            resp.status_code == 416
+            or (
+                resp.status_code == 206
+                and (range_start(resp) != resume_from or is_encoded(resp.headers))
+            )
+        ):
+            raise PartMismatch()
+        resp.raise_for_status()
+
+        hasher = hashlib.sha256()
+        if resp.status_code == 206:
+            logging.info(f"Resuming download of {url} from byte {resume_from}")
+            with part_p.open("rb") as f:
+                while chunk := f.read(CHUNK_SIZE):
+                    hasher.update(chunk)
+            mode = "ab"
+        else:
+            # Also when upstream doesn't do ranges, or the part is out of date
+            part_meta = validators(
+                url, resp.headers, resp.charset_encoding or "utf-8"
+            ) | {"encoded": is_encoded(resp.headers)}
+            write_atomic(part_meta_p, lambda f: f.write(json.dumps(part_meta).encode()))
+            mode = "wb"
+        downloaded_bytes = 0
+        with part_p.open(mode) as f:
+            for chunk in resp.iter_bytes(CHUNK_SIZE):
+                hasher.update(chunk)
+                f.write(chunk)
+                downloaded_bytes += len(chunk)
+
+    part_meta = json.loads(part_meta_p.read_text())
+    meta = part_meta | {"sha256": blobs.add_file(part_p, hasher.hexdigest())}
+    meta_p, _ = entry_paths(url)
+    write_atomic(meta_p, lambda f: f.write(json.dumps(meta).encode()))
+    part_meta_p.unlink()
+    return cached_response(url, meta, False, downloaded_bytes)
+
+
+def is_retryable(e: Exception) -> bool:
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code in retry_statuses
+    return isinstance(e, (httpx.TransportError, httpx.DecodingError))
+
+
+def fetch(url: str, follow_redirects=True) -> CachedResponse:
+    """
+    GET a url through the cache. The body is streamed to disk, so this is fine to
+    use for large archives.
+    """
+    cache_dir().mkdir(parents=True, exist_ok=True)
+    with url_locks_lock:
+        url_lock = url_locks[url]
+    with url_lock:
+        attempt = 0
+        while True:
+            try:
+                return download(url, follow_redirects)
+            except (
+                httpx.TransportError,
+                httpx.DecodingError,
+                httpx.HTTPStatusError,
+            ) as e:
+                if attempt == RETRIES or not is_retryable(e):
+                    raise
+                delay = min(BACKOFF_SECONDS * 2**attempt, MAX_BACKOFF_SECONDS)
+                logging.warning(
+                    f"Fetching {url} failed with {e!r}, retry {attempt + 1} of {RETRIES} in {delay:.0f}s"  # noqa: E501
+                )
+                time.sleep(delay)
+                attempt += 1
+
+
+def curl_headers(headers_p: Path) -> httpx.Headers | None:
+    """The headers in a curl -D dump that the body belongs to, None if there are
+    none."""
+    if not headers_p.exists() or headers_p.stat().st_size == 0:
+        return None
+    # With -L the dump has every response in the redirect chain (and with --retry
+    # of every attempt), the last one is the response the body belongs to
+    last_response = headers_p.read_text().strip().split("\r\n\r\n")[-1]
+    headers = httpx.Headers()
+    for line in last_response.splitlines()[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip()] = value.strip()
+    return headers
+
+
+def download_curl(url: str) -> CachedResponse:
+    """One attempt at fetch_curl, resuming the part left by an earlier one if
+    possible."""
+    meta = read_meta(url)
+    part_p, part_meta_p = part_paths(url)
+    resume_from, headers = resume_headers(url)
+    if resume_from == 0:
+        remove_part(url)
+    else:
+        # curl asks for the rest itself
+        del headers["Range"]
+    with tempfile.TemporaryDirectory(dir=cache_dir()) as tmp:
+        headers_tmp = Path(tmp) / "headers"
+        # curl backs off exponentially between retries of transient errors too.
+        # -C - carries on from the part left by an earlier fetch_curl, a retry
+        # within this one starts over from there
+        args = ["curl", "-sS", "-L", "--retry", str(RETRIES), "-C", "-"]
+        args += ["-o", str(part_p), "-D", str(headers_tmp)]
+        args += ["-w", "%{http_code}"]
+        for name, value in (conditional_headers(meta) | headers).items():
+            args += ["-H", f"{name}: {value}"]
+        args.append(rewritten(url))
+        proc = subprocess.run(args, capture_output=True, text=True)
+        resp_headers = curl_headers(headers_tmp)
+    status = proc.stdout.strip()
+
+    if proc.returncode != 0:
+        if proc.returncode == CURL_RANGE_ERROR and resume_from > 0:
+            # Upstream sent the whole body instead, e.g. since it changed
+            raise PartMismatch()
+        if resume_from == 0 and resp_headers is not None and status.startswith("2"):
+            # So that the next fetch can resume the part
+            part_meta = validators(url, resp_headers, "utf-8") | {
+                "encoded": is_encoded(resp_headers)
+            }
+            write_atomic(part_meta_p, lambda f: f.write(json.dumps(part_meta).encode()))
+        raise subprocess.CalledProcessError(
+            proc.returncode, args, proc.stdout, proc.stderr
+        )
+    if status == "304" and meta is not None:
+        remove_part(url)
+        return cached_response(url, meta, not_modified=True)
+    if status == "416" and resume_from > 0:
+        raise PartMismatch()
+    if not status.startswith("2"):
+        # Without -f curl wrote the error page to the part
+        remove_part(url)
+        raise RuntimeError(f"curl got HTTP {status} for {url}")
+
+    assert resp_headers is not None
+    charset = httpx.Response(200, headers=resp_headers).charset_encoding
+    downloaded_bytes = part_p.stat().st_size - resume_from
+    meta = write_meta(url, resp_headers, charset or "utf-8", blobs.add_file(part_p))
+    part_meta_p.unlink(missing_ok=True)
+    return cached_response(url, meta, False, downloaded_bytes)
+
+
+def fetch_curl(url: str) -> CachedResponse:
+    """
+    Like fetch, but with curl for upstreams like readthedocs that seem to block
+    httpx.
+    """
+    cache_dir().mkdir(parents=True, exist_ok=True)
+    with url_locks_lock:
+        url_lock = url_locks[url]
+    with url_lock:
+        try:
+            return download_curl(url)
+        except PartMismatch:
+            remove_part(url)
+            return download_curl(url)
@@ -2,8 +2,8 @@ import logging
 
 import click
 
-from .cli import cli, collect, dl_zip
-from .license_info import license_info
+from .builds import Build
+from .cli import cli, collect_zip
 
 
 @click.command()
@@ -16,24 +16,25 @@ def hy(ctx):
     logging.info(
         f"Downloading hy {version} txts from github.com/abidsikder/hy-llms-txt"
     )
-    dl_zip(
-        "https://github.com/abidsikder/hy-llms-txt/archive/refs/heads/master.zip",
-        scratchspace,
+    build = Build(ctx, version)
+    resp = build.fetch(
+        "https://github.com/abidsikder/hy-llms-txt/archive/refs/heads/master.zip"
     )
-    extracted = scratchspace / "hy-llms-txt-master"
+    if build.is_fresh():
+        return
 
     txts = ctx.obj["txts"]
     txt_dest = txts / f"hy-{version}.txt"
-    collect(
-        "*.txt", extracted / "docs-txts", txt_dest, exclude="index.txt,versioning.txt"
+    collect_zip(
+        resp.path,
+        "*.txt",
+        txt_dest,
+        exclude="index.txt,versioning.txt",
+        root="docs-txts",
     )
+    build.done(txt_dest)
 
     logging.info("Done with hy")
 
 
-license_info["hy"] = """
-<a href="https://github.com/hylang/hy?tab=License-1-ov-file" target="_blank">
-hy license
-</a>
-"""
 cli.add_command(hy)
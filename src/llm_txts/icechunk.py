@@ -1,13 +1,24 @@
 import logging
-import subprocess
+from pathlib import Path
 
 import click
-from bs4 import BeautifulSoup
 
-from .cli import cli, collect, common_soup_clean, dl_tgz, gh_latest_tag
-from .license_info import license_info
+from .builds import Build
+from .cleanup import Rule, Rules, clean_html_blocks, common_rules
+from .cli import cli, concurrently, run_cpu, write_markdown
+from .versions import gh_latest_tag, latest_release_sources
 
-license_info["icechunk"] = "Apache License 2.0"
+# details.quote are pieces of the source code along with line numbers below each
+# line of the api documentation, they are unnecessary and clutter up the context
+# with a bunch of line numbers
+rules = Rules([Rule("details.quote")], common_rules)
+
+
+def convert(reference_html_p: Path, encoding: str, txt_dest: Path):
+    reference_html = reference_html_p.read_bytes().decode(encoding, errors="replace")
+    cleaned = clean_html_blocks(reference_html, rules, content="div.md-content")
+    with txt_dest.open(mode="a") as f:
+        write_markdown(cleaned, f)
 
 
 @click.command
@@ -23,38 +34,28 @@ def icechunk(ctx, version: str | None):
 
     # Get most of the docs from the handwritten markdown tutorials in
     # the code repository
-    logging.info(f"Downloading icechunk {version} source code")
-    download_url = (
-        f"https://github.com/earth-mover/icechunk/archive/refs/tags/v{version}.tar.gz"
+    logging.info(f"Collecting handwritten docs from icechunk {version} source code")
+    tag = f"v{version}"
+    reference_url = f"https://icechunk.io/en/v{version}/reference/"
+    build = Build(ctx, version)
+    source, reference_resp = concurrently(
+        lambda: build.fetch_source(
+            "earth-mover/icechunk", tag, "**.md", root="docs/docs"
+        ),
+        lambda: build.fetch_curl(reference_url),
     )
-    dl_tgz(download_url, scratchspace)
-    extracted = scratchspace / f"icechunk-{version}"
-    logging.info("Collecting handwritten docs from source code")
+    if build.is_fresh():
+        return
+
     txt_dest = ctx.obj["txts"] / f"icechunk-{version}.md"
-    collect("**.md", extracted / "docs" / "docs", txt_dest)
+    source.collect(txt_dest)
 
     logging.info("Collecting the auto generated api docs from the website")
-    curl_resp = subprocess.run(
-        ["curl", "-L", f"https://icechunk.io/en/v{version}/reference/"],
-        check=True,
-        capture_output=True,
-    )
-    soup = BeautifulSoup(curl_resp.stdout.decode(), "lxml")
-    content_div = soup.find("div", class_="md-content")
-    # these are pieces of the source code along with line numbers below each line
-    # of the api documentation, they are unnecessary and clutter up the context
-    # with a bunch of line numbers
-    for elem in content_div.find_all("details", class_="quote"):
-        elem.decompose()
-    common_soup_clean(content_div)
-
-    text_maker = ctx.obj["text_maker"]
-    converted = text_maker.handle(str(content_div))
-
-    with txt_dest.open(mode="a") as f:
-        f.write(converted)
+    run_cpu(ctx, convert, reference_resp.path, reference_resp.encoding, txt_dest)
+    build.done(txt_dest)
 
     logging.info(f"Done processing icechunk {version}")
 
 
+latest_release_sources["icechunk"] = "earth-mover/icechunk"
 cli.add_command(icechunk)
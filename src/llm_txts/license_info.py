@@ -1,6 +1,55 @@
 """
-Set this dict up so it can be reused across multiple files
-for adding license information.
+License information for every documentation set, shown on the website. Kept here
+rather than next to each command so that build-site doesn't have to import every
+command's module to get it.
 """
 
-license_info = dict()
+cc_by_sa = "Creative Commons Attribution-ShareAlike License v2.5 or later"
+
+license_info = {
+    "bash": "GNU Free Documentation License",
+    "beautifulsoup": "MIT License",
+    "boto3": "Apache 2.0 License",
+    "click": "BSD 3-Clause License",
+    "commander.js": "MIT License",
+    "css": cc_by_sa,
+    "dom / Web APIs": cc_by_sa,
+    "git": "GPLv2",
+    "homebrew": "BSD 2-Clause License",
+    "html": cc_by_sa,
+    "hy": """
+<a href="https://github.com/hylang/hy?tab=License-1-ov-file" target="_blank">
+hy license
+</a>
+""",
+    "icechunk": "Apache License 2.0",
+    "javascript": cc_by_sa,
+    "jq": "Creative Commons Attribution 3.0 license",
+    "mlx": "MIT License",
+    "networkx": "3-clause BSD license",
+    "Node.js": """
+<a href="https://github.com/nodejs/node?tab=License-1-ov-file" target="_blank">
+Node.js license
+</a>
+""",
+    "numpy": "3-clause BSD License",
+    "p5.js": "LGPL-2.1 License",
+    "progit book": "Creative Commons Attribution Non Commercial Share Alike 3.0",
+    "puppeteer": "Apache 2.0 License",
+    "python": "Python Software Foundation License Version 2",
+    "pytorch": "the pytorch BSD-like license https://github.com/pytorch/pytorch/blob/main/LICENSE",
+    "ruff": "MIT License",
+    "svelte": "MIT License",
+    "ty": "MIT License",
+    "typescript": "Apache License, Version 2.0",
+    "typst": "Apache 2.0 License",
+    "uv": "MIT License",
+    "vite": "MIT License",
+    "vitest": "MIT License",
+    "whenever": "MIT License",
+    "xarray": "Apache License 2.0",
+    "zarr": "MIT License",
+    "zed": "GNU AGPLv3",
+    "zig": "MIT License",
+    "zsh": "MIT License",
+}
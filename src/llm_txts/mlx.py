@@ -1,15 +1,33 @@
-import io
 import logging
-import tempfile
 from pathlib import Path
 
 import click
-from bs4 import BeautifulSoup
 
-from .cli import cli, collect, common_soup_clean, dl_tgz, gh_latest_tag
-from .license_info import license_info
+from .builds import Build
+from .cleanup import Rules, clean_html_blocks, common_rules
+from .cli import (
+    cli,
+    collected_paths,
+    extract_tgz,
+    iter_collected,
+    run_cpu,
+    write_markdown,
+)
+from .versions import gh_latest_tag, latest_release_sources
 
-license_info["mlx"] = "MIT License"
+rules = Rules(common_rules)
+
+
+def convert(html_ps: list[Path], txt_dest: Path):
+    # Pages are cleaned one by one, lxml stops parsing at the end of the first
+    # document if they're concatenated
+    cleaned = (
+        block
+        for page in iter_collected(html_ps)
+        for block in clean_html_blocks(page, rules, content="article.bd-article")
+    )
+    with txt_dest.open(mode="w") as f:
+        write_markdown(cleaned, f)
 
 
 @click.command
@@ -24,34 +42,25 @@ def mlx(ctx):
     # This is done since correlating between the gh-pages and
     # the github tag commits is very difficult
     logging.info("Downloading the latest version's gh-pages build")
-    dl_tgz(
-        "https://github.com/ml-explore/mlx/archive/refs/heads/gh-pages.tar.gz",
-        scratchspace,
+    build = Build(ctx, version)
+    resp = build.fetch(
+        "https://github.com/ml-explore/mlx/archive/refs/heads/gh-pages.tar.gz"
+    )
+    if build.is_fresh():
+        return
+    extract_tgz(resp.path, scratchspace)
+
+    logging.info("Processing built html into the final markdown")
+    html_ps = collected_paths(
+        "dev/**.html,examples/**.html,python/**.html",
+        scratchspace / "mlx-gh-pages" / "docs" / "build" / "html",
     )
-    with tempfile.NamedTemporaryFile(mode="w+", delete=True, suffix=".html") as fp:
-        logging.info("Processing built html into the final markdown")
-        collected_html_p = Path(fp.name)
-        collect(
-            "dev/**.html,examples/**.html,python/**.html",
-            scratchspace / "mlx-gh-pages" / "docs" / "build" / "html",
-            collected_html_p,
-        )
-        soup = BeautifulSoup(collected_html_p.read_text(), "lxml")
-        filtered = io.StringIO()
-        for elem in soup.find_all("article", class_="bd-article"):
-            filtered.write(str(elem))
-        soup = BeautifulSoup(filtered.getvalue(), "lxml")
-
-        common_soup_clean(soup)
-
-        text_maker = ctx.obj["text_maker"]
-        converted = text_maker.handle(str(soup))
-
-        txt_dest = ctx.obj["txts"] / f"mlx-{version}.md"
-        with txt_dest.open(mode="w") as f:
-            f.write(converted)
+    txt_dest = ctx.obj["txts"] / f"mlx-{version}.md"
+    run_cpu(ctx, convert, html_ps, txt_dest)
+    build.done(txt_dest)
 
     logging.info(f"Done processing mlx {version}")
 
 
+latest_release_sources["mlx"] = "ml-explore/mlx"
 cli.add_command(mlx)
@@ -1,12 +1,10 @@
 import logging
-import shutil
 
 import click
 
-from .cli import cli, dl_zip
-from .license_info import license_info
-
-license_info["boto3"] = "3-clause BSD license"
+from . import blobs
+from .builds import Build
+from .cli import cli, extract_zip
 
 
 @click.command
@@ -19,14 +17,18 @@ def networkx(ctx):
     logging.info(
         f"Downloading networkx {version} llms.txt from github.com/abidsikder/networkx-llms-txt"  # noqa: E501
     )
-    dl_zip(
-        "https://github.com/abidsikder/networkx-llms-txt/archive/refs/heads/llmsmd.zip",
-        scratchspace,
+    build = Build(ctx, version)
+    resp = build.fetch(
+        "https://github.com/abidsikder/networkx-llms-txt/archive/refs/heads/llmsmd.zip"
     )
+    if build.is_fresh():
+        return
+    extract_zip(resp.path, scratchspace)
     extracted = scratchspace / "networkx-llms-txt-llmsmd"
     source = extracted / "doc" / f"networkx-{version}.md"
     dest = ctx.obj["txts"] / source.name
-    shutil.copyfile(source, dest)
+    blobs.copy(source, dest)
+    build.done(dest)
 
     logging.info("Done copying over networkx llms.txt")
 
@@ -1,47 +1,48 @@
 import logging
+from pathlib import Path
 
 import click
-import httpx
-from bs4 import BeautifulSoup
 
-from .cli import cli
-from .license_info import license_info
+from .builds import Build
+from .cleanup import Rule, Rules, clean_html_blocks
+from .cli import build_all_variants, build_versions, cli, run_cpu, write_markdown
 
-license_info["Node.js"] = """
-<a href="https://github.com/nodejs/node?tab=License-1-ov-file" target="_blank">
-Node.js license
-</a>
-"""
+rules = Rules([Rule("button.copy-button"), Rule("code.language-js.cjs")])
+
+
+def convert(html_p: Path, encoding: str, txt_dest: Path):
+    html = html_p.read_bytes().decode(encoding, errors="replace")
+    cleaned = clean_html_blocks(html, rules, content="div#apicontent")
+    with txt_dest.open(mode="w") as f:
+        write_markdown(cleaned, f)
 
 
 @click.command
 @click.pass_context
-@click.argument("version", type=str)
-def nodejs(ctx, version: str):
+@click.argument("versions", nargs=-1, required=True)
+def nodejs(ctx, versions: tuple[str, ...]):
     """
-    Version is the major version, e.g. 22, 23, 24.
+    Versions are major versions, e.g. 22 23 24, each one is built concurrently.
     """
     scratchspace = ctx.obj["scratchspace"] / "nodejs"
     scratchspace.mkdir(exist_ok=True)
 
-    logging.info("Downloading documentation page for parsing")
-    download_url = f"https://nodejs.org/docs/latest-v{version}.x/api/all.html"
-    resp = httpx.get(download_url)
+    build_versions(ctx, "version", versions, build_nodejs)
 
-    soup = BeautifulSoup(resp.text, "lxml")
-    content_div = soup.find("div", id="apicontent")
-    for copy_button in content_div.find_all("button", class_="copy-button"):
-        copy_button.decompose()
-    for code_block in content_div.find_all("code", class_="language-js cjs"):
-        code_block.decompose()
-
-    text_maker = ctx.obj["text_maker"]
-    converted = text_maker.handle(str(content_div))
 
+def build_nodejs(ctx, version: str):
+    logging.info(f"Downloading Node.js {version} documentation page for parsing")
+    download_url = f"https://nodejs.org/docs/latest-v{version}.x/api/all.html"
+    build = Build(ctx, version)
+    resp = build.fetch(download_url)
+    if build.is_fresh():
+        return
     txt_dest = ctx.obj["txts"] / f"nodejs-{version}.md"
-    txt_dest.write_text(converted)
+    run_cpu(ctx, convert, resp.path, resp.encoding, txt_dest)
+    build.done(txt_dest)
 
     logging.info(f"Done processing Node.js major version {version}")
 
 
+build_all_variants["nodejs"] = [["22", "23", "24"]]
 cli.add_command(nodejs)
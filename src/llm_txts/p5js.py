@@ -3,28 +3,15 @@ import json
 import logging
 
 import click
-import httpx
 
-from .cli import cli
-from .license_info import license_info
+from .builds import Build
+from .cli import cli, make_text_maker, run_cpu
+from .profiling import stage
 
-license_info["p5.js"] = "LGPL-2.1 License"
 
-
-@click.command
-@click.pass_context
-def p5js(ctx):
-    scratchspace = ctx.obj["scratchspace"] / "p5js"
-    scratchspace.mkdir(exist_ok=True)
-
-    logging.info("Downloading p5js docs data")
-    resp = httpx.get("https://p5js.org/reference/data.json")
-    docs_data = json.loads(resp.text)
-    version = docs_data["project"]["version"]
-
-    logging.info(f"Got version {version}")
+def convert(docs_data: dict) -> str:
     txt = io.StringIO()
-    text_maker = ctx.obj["text_maker"]
+    text_maker = make_text_maker()
 
     def write(s):
         txt.write(s)
@@ -49,9 +36,30 @@ def p5js(ctx):
                 write(text_maker.handle(str(value)))
 
     recurse(docs_data, 1)
+    return txt.getvalue()
 
+
+@click.command
+@click.pass_context
+def p5js(ctx):
+    scratchspace = ctx.obj["scratchspace"] / "p5js"
+    scratchspace.mkdir(exist_ok=True)
+
+    logging.info("Downloading p5js docs data")
+    build = Build(ctx, "latest")
+    resp = build.fetch("https://p5js.org/reference/data.json")
+    if build.is_fresh():
+        return
+    docs_data = json.loads(resp.read_text())
+    version = docs_data["project"]["version"]
+    build.release = version
+
+    logging.info(f"Got version {version}")
     txt_dest = ctx.obj["txts"] / f"p5js-{version}.md"
-    txt_dest.write_text(txt.getvalue())
+    converted = run_cpu(ctx, convert, docs_data)
+    with stage(ctx, "write"):
+        txt_dest.write_text(converted)
+    build.done(txt_dest)
 
     logging.info(f"Done collecting p5.js {version} docs")
 
@@ -0,0 +1,336 @@
+"""
+Per stage timings and memory use of documentation set builds, enabled with the cli
+--profile option. Code wraps each pipeline stage (download, extract, collect,
+parse, cleanup, html2text, ...) in stage, and every documentation set gets a JSON
+report in scratchspace/profiles when its command finishes. With --profile-cprofile
+every stage also gets a cProfile dump next to it, of all its calls together.
+
+Memory is measured with tracemalloc and the process RSS, both process wide, so
+under build-all they include whatever else is being built at the same time.
+
+Independently of --profile, the CPU time and peak RSS of the work each command
+puts on the process pool is tallied up for the build history.
+"""
+
+import contextlib
+import cProfile
+import json
+import logging
+import marshal
+import os
+import resource
+import threading
+import time
+import tracemalloc
+import weakref
+from concurrent.futures import Executor, Future
+from dataclasses import dataclass
+from pathlib import Path
+
+import click
+
+
+def doc_set_name(ctx) -> str:
+    """e.g. "python 3.13", "zig lang_ref master", "dom per_page" or "nodejs 23 24" """
+    return " ".join(
+        [ctx.command_path.split(" ", 1)[1]]
+        + [
+            name if v is True else " ".join(v) if isinstance(v, tuple) else str(v)
+            for name, v in ctx.params.items()
+            if v is not None and v is not False
+        ]
+    )
+
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size, since the last reset_peak_rss on linux."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def reset_peak_rss():
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def rss_bytes() -> int | None:
+    """Current resident set size, on linux."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return None
+
+
+@dataclass
+class StageStats:
+    calls: int = 0
+    wall_s: float = 0.0
+    cpu_s: float = 0.0
+    peak_traced_bytes: int = 0
+    max_rss_bytes: int = 0
+    rss_bytes: int | None = None
+
+    def add(self, other: "StageStats"):
+        self.calls += other.calls
+        self.wall_s += other.wall_s
+        self.cpu_s += other.cpu_s
+        self.peak_traced_bytes = max(self.peak_traced_bytes, other.peak_traced_bytes)
+        self.max_rss_bytes = max(self.max_rss_bytes, other.max_rss_bytes)
+        self.rss_bytes = other.rss_bytes
+
+
+def merge_profile(into: dict, profile: dict):
+    """
+    Add the stats of a cProfile.Profile run to those of earlier runs, like
+    pstats.Stats.add does.
+    """
+    for func, (cc, nc, tt, ct, callers) in profile.items():
+        if func not in into:
+            into[func] = (cc, nc, tt, ct, dict(callers))
+            continue
+        into_cc, into_nc, into_tt, into_ct, into_callers = into[func]
+        for caller, stat in callers.items():
+            prev = into_callers.get(caller)
+            into_callers[caller] = (
+                stat
+                if prev is None
+                else tuple(a + b for a, b in zip(prev, stat, strict=True))
+            )
+        into[func] = (
+            into_cc + cc,
+            into_nc + nc,
+            into_tt + tt,
+            into_ct + ct,
+            into_callers,
+        )
+
+
+class Report:
+    """The stages of one documentation set, by name, in the order first seen."""
+
+    def __init__(self, name: str, cprofile: bool):
+        self.name = name
+        self.cprofile = cprofile
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.stages: dict[str, StageStats] = {}
+        # cProfile stats of each stage, in the format pstats loads
+        self.profiles: dict[str, dict] = {}
+
+    def add(self, name: str, stats: StageStats, profile: dict | None = None):
+        with self.lock:
+            self.stages.setdefault(name, StageStats()).add(stats)
+            if profile is not None:
+                merge_profile(self.profiles.setdefault(name, {}), profile)
+
+    def merge(self, stages: dict[str, StageStats], profiles: dict[str, dict]):
+        for name, stats in stages.items():
+            self.add(name, stats, profiles.get(name))
+
+    def write(self, profiles_dir: Path):
+        file_name = self.name.replace(" ", "_")
+        profiles_dir.mkdir(parents=True, exist_ok=True)
+        dumps = {}
+        for stage_name, profile in self.profiles.items():
+            dump_p = profiles_dir / file_name / f"{stage_name}.prof"
+            dump_p.parent.mkdir(exist_ok=True)
+            # What pstats.Stats.dump_stats writes
+            with dump_p.open("wb") as f:
+                marshal.dump(profile, f)
+            dumps[stage_name] = str(dump_p)
+        report_p = profiles_dir / f"{file_name}.json"
+        report = {
+            "name": self.name,
+            "started_at": self.started,
+            "wall_s": time.time() - self.started,
+            "stages": {
+                name: vars(stats) | {"cprofile_dump": dumps.get(name)}
+                for name, stats in self.stages.items()
+            },
+        }
+        report_p.write_text(json.dumps(report, indent=2))
+        logging.info(f"Wrote profile of {self.name} to {report_p}")
+
+
+# Reports of the commands being profiled, by click context
+reports_lock = threading.Lock()
+reports: dict[click.Context, Report] = {}
+
+# In a process pool worker, the report of the task being run
+worker_report: Report | None = None
+
+# The open stages of each thread, so that nested stages pass their peak up
+open_stages = threading.local()
+
+
+@dataclass
+class PoolUsage:
+    cpu_s: float = 0.0
+    max_rss_bytes: int = 0
+
+
+# What each click context's work on the process pool took
+pool_usages_lock = threading.Lock()
+pool_usages: weakref.WeakKeyDictionary[click.Context, PoolUsage] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def enable(ctx, cprofile: bool):
+    ctx.obj["profile"] = {"cprofile": cprofile}
+    tracemalloc.start()
+
+
+def current_report(ctx) -> Report | None:
+    if ctx is None:
+        ctx = click.get_current_context(silent=True)
+    if ctx is None or ctx.obj is None:
+        return worker_report
+    profile = ctx.obj.get("profile")
+    if profile is None or ctx.parent is None:
+        return None
+    with reports_lock:
+        report = reports.get(ctx)
+        if report is None:
+            report = reports[ctx] = Report(doc_set_name(ctx), profile["cprofile"])
+
+            def close():
+                with reports_lock:
+                    del reports[ctx]
+                report.write(ctx.obj["scratchspace"] / "profiles")
+
+            ctx.call_on_close(close)
+    return report
+
+
+@contextlib.contextmanager
+def stage(ctx, name: str):
+    """
+    Time the code in the with block as the stage name of the documentation set
+    being built by ctx, or the one of the current click context if ctx is None.
+    Does nothing unless profiling.
+    """
+    report = current_report(ctx)
+    if report is None:
+        yield
+        return
+
+    stack = getattr(open_stages, "stack", None)
+    if stack is None:
+        stack = open_stages.stack = []
+    stats = StageStats(calls=1)
+    stack.append(stats)
+    profiler = None
+    if report.cprofile:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Only one profiler can be active at a time, nested and concurrent
+            # stages go without
+            profiler = None
+    tracemalloc.reset_peak()
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    try:
+        yield
+    finally:
+        stats.wall_s = time.perf_counter() - wall_start
+        stats.cpu_s = time.thread_time() - cpu_start
+        stats.peak_traced_bytes = max(
+            stats.peak_traced_bytes, tracemalloc.get_traced_memory()[1]
+        )
+        stats.rss_bytes = rss_bytes()
+        stats.max_rss_bytes = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        profile = None
+        if profiler is not None:
+            profiler.disable()
+            profiler.create_stats()
+            profile = profiler.stats
+        stack.pop()
+        if len(stack) > 0:
+            stack[-1].peak_traced_bytes = max(
+                stack[-1].peak_traced_bytes, stats.peak_traced_bytes
+            )
+        report.add(name, stats, profile)
+
+
+def profiled_call(report_name: str, cprofile: bool, fn, *args):
+    """
+    Run fn in a process pool worker with its stages going to a report of its own,
+    give back its result and that report for the caller to merge.
+    """
+    global worker_report
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    worker_report = Report(report_name, cprofile)
+    try:
+        with stage(None, fn.__name__):
+            result = fn(*args)
+        return result, (worker_report.stages, worker_report.profiles)
+    finally:
+        worker_report = None
+
+
+def pool_usage(ctx) -> PoolUsage:
+    """What the work ctx, or the current click context, put on the process pool
+    took so far."""
+    if ctx is None:
+        ctx = click.get_current_context(silent=True)
+    if ctx is None:
+        return PoolUsage()
+    with pool_usages_lock:
+        return pool_usages.setdefault(ctx, PoolUsage())
+
+
+def metered_call(fn, *args):
+    """fn(*args) in a process pool worker, along with the CPU time and peak RSS it
+    took. Workers run one call at a time, so those are the call's own."""
+    reset_peak_rss()
+    cpu_start = time.process_time()
+    result = fn(*args)
+    return result, time.process_time() - cpu_start, peak_rss_bytes()
+
+
+def submit(ctx, pool: Executor, fn, *args) -> Future:
+    """
+    pool.submit(fn, *args), with the CPU time and peak RSS it takes added to the
+    pool_usage of ctx, and the stages fn goes through in the worker added to the
+    report of ctx when profiling.
+    """
+    usage = pool_usage(ctx)
+    report = current_report(ctx)
+    if report is None:
+        metered = pool.submit(metered_call, fn, *args)
+    else:
+        metered = pool.submit(
+            metered_call, profiled_call, report.name, report.cprofile, fn, *args
+        )
+    future = Future()
+
+    def unwrap(metered: Future):
+        try:
+            result, cpu_s, max_rss_bytes = metered.result()
+        except BaseException as e:
+            future.set_exception(e)
+            return
+        with pool_usages_lock:
+            usage.cpu_s += cpu_s
+            usage.max_rss_bytes = max(usage.max_rss_bytes, max_rss_bytes)
+        if report is not None:
+            result, (stages, profiles) = result
+            report.merge(stages, profiles)
+        future.set_result(result)
+
+    metered.add_done_callback(unwrap)
+    return future
@@ -2,12 +2,8 @@ import logging
 
 import click
 
-from .cli import cli, collect, dl_tgz
-from .license_info import license_info
-
-license_info["progit book"] = (
-    "Creative Commons Attribution Non Commercial Share Alike 3.0"
-)
+from .builds import Build
+from .cli import cli, collect_tgz
 
 
 @click.command
@@ -16,13 +12,17 @@ def progit(ctx):
     scratchspace = ctx.obj["scratchspace"] / "progit"
     scratchspace.mkdir(exist_ok=True)
 
-    logging.info("Downloading progit2 contents from github")
-    dl_tgz(
-        "https://github.com/progit/progit2/archive/refs/heads/main.tar.gz", scratchspace
+    build = Build(ctx, "main")
+    resp = build.fetch(
+        "https://github.com/progit/progit2/archive/refs/heads/main.tar.gz"
     )
+    if build.is_fresh():
+        return
+
     txt_dest = ctx.obj["txts"] / "git-progit2.txt"
-    logging.info(f"Collecting writing together to {txt_dest}")
-    collect("**.asc", scratchspace, txt_dest)
+    logging.info(f"Collecting progit2 writing from github together to {txt_dest}")
+    collect_tgz(resp.path, "**.asc", txt_dest)
+    build.done(txt_dest)
     logging.info("Done with progit")
 
 
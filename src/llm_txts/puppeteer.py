@@ -2,10 +2,8 @@ import logging
 
 import click
 
-from .cli import cli, collect, dl_zip
-from .license_info import license_info
-
-license_info["puppeteer"] = "Apache 2.0 License"
+from .builds import Build
+from .cli import cli, collect_zip
 
 
 @click.command
@@ -18,18 +16,16 @@ def puppeteer(ctx, version: str):
     logging.info(
         f"Downloading puppeteer {version} md docs from github.com/puppeteer/puppeteer"
     )
-    dl_zip(
-        f"https://github.com/puppeteer/puppeteer/archive/refs/tags/puppeteer-v{version}.zip",
-        scratchspace,
+    build = Build(ctx, version)
+    resp = build.fetch(
+        f"https://github.com/puppeteer/puppeteer/archive/refs/tags/puppeteer-v{version}.zip"
     )
-    extracted = scratchspace / f"puppeteer-puppeteer-v{version}"
+    if build.is_fresh():
+        return
 
     txt_dest = ctx.obj["txts"] / f"puppeteer-v{version}.md"
-    collect(
-        "docs/**.md",
-        extracted,
-        txt_dest,
-    )
+    collect_zip(resp.path, "docs/**.md", txt_dest)
+    build.done(txt_dest)
 
     logging.info("Done collecting puppeteer markdown docs")
 
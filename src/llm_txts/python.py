@@ -2,53 +2,82 @@ import logging
 import re
 
 import click
-import httpx
 from bs4 import BeautifulSoup
 
-from .cli import cli, collect, dl_zip
-from .license_info import license_info
+from .builds import Build
+from .cli import build_all_variants, build_versions, cli, collect_zip
+from .httpcache import fetch
+from .profiling import stage
 
-license_info["python"] = "Python Software Foundation License Version 2"
+
+def latest_patches(ctx, minor_versions: list[str]) -> dict[str, str]:
+    """The latest patch version of each minor version, from the python.org ftp
+    index."""
+    with stage(ctx, "download"):
+        response = fetch("https://www.python.org/ftp/python/")
+    with stage(ctx, "parse"):
+        soup = BeautifulSoup(response.read_text(), "lxml")
+    versions = {}
+    for minor_version in minor_versions:
+        version_pattern = re.compile(r"^" + re.escape(minor_version) + r"\.(\d+)/$")
+        patch_versions = []
+        # Find all anchor tags (links)
+        for link in soup.find_all("a"):
+            href = link.get("href")
+            match = version_pattern.match(href)
+            if match:
+                # Extract the patch number (the first group in the regex)
+                patch_num = int(match.group(1))
+                patch_versions.append(patch_num)
+        if len(patch_versions) == 0:
+            raise click.ClickException(f"No python {minor_version} release found")
+        versions[minor_version] = f"{minor_version}.{max(patch_versions)}"
+        logging.info(f"Found latest patch version {versions[minor_version]}")
+    return versions
 
 
 @click.command
 @click.pass_context
-@click.argument("minor-version", type=str)
-def python(ctx, minor_version: str):
+@click.argument("minor-versions", nargs=-1, required=True)
+def python(ctx, minor_versions: tuple[str, ...]):
+    """
+    Minor versions are e.g. 3.12 3.13, each one is built concurrently.
+    """
     scratchspace = ctx.obj["scratchspace"] / "python"
     scratchspace.mkdir(exist_ok=True)
 
-    logging.info(f"Finding the latest patch version for {minor_version}")
-    response = httpx.get("https://www.python.org/ftp/python/")
-    soup = BeautifulSoup(response.text, "lxml")
-    version_pattern = re.compile(r"^" + re.escape(minor_version) + r"\.(\d+)/$")
-    patch_versions = []
-    # Find all anchor tags (links)
-    for link in soup.find_all("a"):
-        href = link.get("href")
-        match = version_pattern.match(href)
-        if match:
-            # Extract the patch number (the first group in the regex)
-            patch_num = int(match.group(1))
-            patch_versions.append(patch_num)
-    latest_patch = max(patch_versions)
-    version = f"{minor_version}.{latest_patch}"
-    logging.info(f"Found latest patch version {version}")
-
-    logging.info("Downloading documentation txt zip and extracting")
+    logging.info(f"Finding the latest patch versions for {', '.join(minor_versions)}")
+    versions = latest_patches(ctx, list(minor_versions))
+    build_versions(
+        ctx,
+        "minor_version",
+        minor_versions,
+        lambda version_ctx, minor_version: build_python(
+            version_ctx, versions[minor_version]
+        ),
+    )
+
+
+def build_python(ctx, version: str):
     download_url = f"https://www.python.org/ftp/python/doc/{version}/python-{version}-docs-text.zip"
-    dl_zip(download_url, scratchspace)
+    build = Build(ctx, version)
+    resp = build.fetch(download_url)
+    if build.is_fresh():
+        return
+
     txt_dest = ctx.obj["txts"] / f"python-{version}.txt"
     logging.info(
-        f"Collecting all doc txts into a single txt and placing it inside of {txt_dest}"
+        f"Collecting all doc txts from the documentation zip into a single txt and placing it inside of {txt_dest}"  # noqa: E501
     )
-    collect(
+    collect_zip(
+        resp.path,
         "library/**.txt",
-        scratchspace / f"python-{version}-docs-text",
         txt_dest,
         exclude="stdtypes.txt,tk.txt,tkinter*.txt",
     )
+    build.done(txt_dest)
     logging.info(f"Done processing python {version}")
 
 
+build_all_variants["python"] = [["3.10", "3.11", "3.12", "3.13"]]
 cli.add_command(python)
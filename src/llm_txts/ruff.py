@@ -2,8 +2,9 @@ import logging
 
 import click
 
-from .cli import cli, collect, dl_tgz, gh_latest_tag
-from .license_info import license_info
+from .builds import Build
+from .cli import cli
+from .versions import gh_latest_tag, latest_release_sources
 
 
 @click.command()
@@ -16,21 +17,19 @@ def ruff(ctx):
     version = gh_latest_tag("astral-sh/ruff")
 
     logging.info(f"Downloading ruff {version} source code from github")
-    download_url = (
-        f"https://github.com/astral-sh/ruff/archive/refs/tags/{version}.tar.gz"
-    )
-
-    dl_tgz(download_url, scratchspace)
-    extracted_dest = scratchspace / f"ruff-{version}"
-    logging.info(f"Wrote source code to {extracted_dest}")
+    build = Build(ctx, version)
+    source = build.fetch_source("astral-sh/ruff", version, "**.md", root="docs")
+    if build.is_fresh():
+        return
 
     txts = ctx.obj["txts"]
     txt_dest = txts / f"ruff-{version}.md"
     logging.info(f"Collecting ruff md docs together and writing to {txt_dest}")
-    collect("**.md", extracted_dest / "docs", txt_dest)
+    source.collect(txt_dest)
+    build.done(txt_dest)
 
     logging.info(f"Done with ruff {version}")
 
 
-license_info["ruff"] = "MIT License"
+latest_release_sources["ruff"] = "astral-sh/ruff"
 cli.add_command(ruff)
@@ -0,0 +1,230 @@
+"""
+Full-text search index over the site's txts, so that agents can find the section
+of a documentation set that covers an API without downloading and grepping whole
+txts. Each txt is split into sections at its headings, and the index has what BM25
+needs for every term: the sections it's in, how often, and each section's length.
+
+    search/index.json               the indexed txts, the number of term shards,
+                                    and the section count and average length
+    search/terms/<shard>.json       {term: [[doc, section, count, length], ...]}
+                                    for the terms whose shard is shard
+    search/sections/<txt>/<n>.json  [[heading, start, end], ...] for the sections
+                                    of a txt from n * SECTIONS_PER_FILE on
+
+doc is the txt's index in index.json, section its index in the txt. start and end
+are the section's byte range in txts/<txt>, for a Range request of just it. A
+term's shard is the FNV-1a hash of its utf-8 mod the number of shards, so clients
+can fetch the shards of a query's terms, rank, and fetch the sections of the best.
+
+Txts are indexed on the process pool into scratchspace by size and mtime, so only
+those rebuilt since the last build-site get read. Index files are only written when
+their content changes, so that their compressed siblings are left alone.
+"""
+
+import itertools
+import json
+import re
+import shutil
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from .cli import cpu_map
+from .shards import find_headings
+
+# Bump when the tokenization or layout changes, to reindex every txt
+INDEX_FORMAT = 1
+
+TERM_SHARDS = 256
+SECTIONS_PER_FILE = 1000
+
+# Lowercased runs of word characters, of up to 64 so that base64 and the like
+# don't bloat the index
+term_re = re.compile(r"(?<!\w)\w{1,64}(?!\w)")
+
+
+def terms(text: str) -> list[str]:
+    return term_re.findall(text.lower())
+
+
+def term_shard(term: str) -> int:
+    h = 0x811C9DC5
+    for b in term.encode():
+        h = ((h ^ b) * 0x01000193) & 0xFFFFFFFF
+    return h % TERM_SHARDS
+
+
+def write_if_changed(p: Path, data: bytes):
+    if p.exists() and p.read_bytes() == data:
+        return
+    p.unlink(missing_ok=True)
+    p.write_bytes(data)
+
+
+def to_json(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def sections(data: bytes) -> list[tuple[str, int, int]]:
+    """The heading, start and end of each section, with any text before the first
+    heading as a section without one."""
+    starts = find_headings(data)
+    if len(starts) == 0 or starts[0][0] > 0:
+        starts.insert(0, (0, ""))
+    ends = [start for start, _ in starts[1:]] + [len(data)]
+    return [
+        (heading, start, end)
+        for (start, heading), end in zip(starts, ends, strict=True)
+    ]
+
+
+def stamp(txt_p: Path) -> dict:
+    st = txt_p.stat()
+    return {"format": INDEX_FORMAT, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def is_indexed(txt_p: Path, cache_dir: Path, sections_dir: Path) -> bool:
+    stamp_p = cache_dir / txt_p.name / "stamp.json"
+    if not stamp_p.exists() or not (sections_dir / txt_p.name).exists():
+        return False
+    indexed = json.loads(stamp_p.read_text())
+    return {k: indexed[k] for k in stamp(txt_p)} == stamp(txt_p)
+
+
+def index_txt(txt_p: Path, cache_dir: Path, sections_dir: Path):
+    """
+    Write the postings of txt_p by term shard to cache_dir / txt name, and its
+    sections files.
+    """
+    txt_stamp = stamp(txt_p)
+    data = txt_p.read_bytes()
+    doc_dir = cache_dir / txt_p.name
+    shutil.rmtree(doc_dir, ignore_errors=True)
+    (doc_dir / "terms").mkdir(parents=True)
+
+    postings: defaultdict[str, list] = defaultdict(list)
+    txt_sections = sections(data)
+    total_length = 0
+    for i, (_, start, end) in enumerate(txt_sections):
+        section_terms = terms(data[start:end].decode(errors="replace"))
+        length = len(section_terms)
+        total_length += length
+        for term, count in Counter(section_terms).items():
+            postings[term].append((i, count, length))
+    by_shard: dict[int, dict[str, list]] = {}
+    for term, term_postings in postings.items():
+        by_shard.setdefault(term_shard(term), {})[term] = term_postings
+    for shard, shard_postings in by_shard.items():
+        (doc_dir / "terms" / f"{shard}.json").write_bytes(to_json(shard_postings))
+
+    txt_sections_dir = sections_dir / txt_p.name
+    txt_sections_dir.mkdir(parents=True, exist_ok=True)
+    written = set()
+    for n, batch in enumerate(
+        itertools.batched(txt_sections, SECTIONS_PER_FILE, strict=False)
+    ):
+        sections_p = txt_sections_dir / f"{n}.json"
+        write_if_changed(sections_p, to_json([list(s) for s in batch]))
+        written.add(sections_p)
+    for p in txt_sections_dir.iterdir():
+        if p.suffix == ".json" and p not in written:
+            p.unlink()
+
+    # Last, so that an interrupted indexing is redone
+    (doc_dir / "stamp.json").write_text(
+        json.dumps(txt_stamp | {"sections": len(txt_sections), "length": total_length})
+    )
+
+
+def merge_shard(shard: int, txt_names: list[str], cache_dir: Path, terms_dir: Path):
+    """Write the term shard of all txts, from the postings of each in cache_dir."""
+    merged: dict[str, list] = {}
+    for doc, txt_name in enumerate(txt_names):
+        p = cache_dir / txt_name / "terms" / f"{shard}.json"
+        if not p.exists():
+            continue
+        for term, postings in json.loads(p.read_text()).items():
+            merged.setdefault(term, []).extend([doc, *posting] for posting in postings)
+    write_if_changed(terms_dir / f"{shard}.json", to_json(dict(sorted(merged.items()))))
+
+
+def term_shards_of(doc_dir: Path) -> set[int]:
+    """The term shards a txt indexed into doc_dir has postings in."""
+    return {int(p.stem) for p in doc_dir.glob("terms/*.json")}
+
+
+def indexed_txt_names(dest: Path) -> list[str] | None:
+    index_p = dest / "index.json"
+    if not index_p.exists():
+        return None
+    index = json.loads(index_p.read_text())
+    if index["format"] != INDEX_FORMAT or index["term_shards"] != TERM_SHARDS:
+        return None
+    return [txt["name"] for txt in index["txts"]]
+
+
+def build_index(ctx, txt_ps: list[Path], dest: Path, cache_dir: Path) -> list[Path]:
+    """Bring the search index in dest up to date with txt_ps and give back its
+    files."""
+    sections_dir = dest / "sections"
+    terms_dir = dest / "terms"
+    for d in [cache_dir, sections_dir, terms_dir]:
+        d.mkdir(parents=True, exist_ok=True)
+    txt_names = [p.name for p in txt_ps]
+    # Txts that are gone, e.g. older versions
+    for d in [cache_dir, sections_dir]:
+        for p in d.iterdir():
+            if p.name not in txt_names:
+                shutil.rmtree(p)
+
+    stale = [p for p in txt_ps if not is_indexed(p, cache_dir, sections_dir)]
+    # Only the term shards that the stale txts had postings in or have now change,
+    # unless the txts (and so their numbering) did
+    if indexed_txt_names(dest) == txt_names:
+        changed = {
+            shard
+            for shard in range(TERM_SHARDS)
+            if not (terms_dir / f"{shard}.json").exists()
+        }
+    else:
+        changed = set(range(TERM_SHARDS))
+    for p in stale:
+        changed |= term_shards_of(cache_dir / p.name)
+    list(
+        cpu_map(
+            ctx,
+            index_txt,
+            stale,
+            itertools.repeat(cache_dir),
+            itertools.repeat(sections_dir),
+        )
+    )
+    for p in stale:
+        changed |= term_shards_of(cache_dir / p.name)
+    list(
+        cpu_map(
+            ctx,
+            merge_shard,
+            sorted(changed),
+            itertools.repeat(txt_names),
+            itertools.repeat(cache_dir),
+            itertools.repeat(terms_dir),
+        )
+    )
+
+    stats = [
+        json.loads((cache_dir / name / "stamp.json").read_text()) for name in txt_names
+    ]
+    section_count = sum(s["sections"] for s in stats)
+    manifest = {
+        "format": INDEX_FORMAT,
+        "term_shards": TERM_SHARDS,
+        "sections_per_file": SECTIONS_PER_FILE,
+        "sections": section_count,
+        "average_length": sum(s["length"] for s in stats) / max(section_count, 1),
+        "txts": [
+            {"name": name, "path": f"txts/{name}", "sections": s["sections"]}
+            for name, s in zip(txt_names, stats, strict=True)
+        ],
+    }
+    write_if_changed(dest / "index.json", json.dumps(manifest, indent=2).encode())
+    return sorted(p for p in dest.rglob("*.json"))
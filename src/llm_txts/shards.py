@@ -0,0 +1,152 @@
+"""
+Splits generated txts that are over a token budget into shards that fit it, cut at
+heading boundaries where possible. Each sharded txt gets a directory with its
+shards and a manifest.json listing every shard's headings, byte range in the txt
+and estimated tokens.
+"""
+
+import bisect
+import json
+import re
+import shutil
+from pathlib import Path
+
+# Same estimate as the site index
+BYTES_PER_TOKEN = 4
+
+atx_heading_re = re.compile(rb"#{1,6}[ \t]+(.+?)[ \t#]*")
+# Setext markdown and rst section underlines (and overlines)
+underline_re = re.compile(rb"(=+|-+|~+|\*+|\^+|\++)[ \t]*")
+fence_re = re.compile(rb" {0,3}(```|~~~)")
+paragraph_re = re.compile(rb"\n[ \t]*\n")
+newline_re = re.compile(rb"\n")
+
+
+def estimate_tokens(n_bytes: int) -> int:
+    return -(-n_bytes // BYTES_PER_TOKEN)
+
+
+def find_headings(data: bytes) -> list[tuple[int, str]]:
+    """The byte offset each heading starts at and its text, outside code fences."""
+    headings = []
+    in_fence = False
+    offset = 0
+    prev: tuple[int, bytes] | None = None
+    prev_prev: tuple[int, bytes] | None = None
+    for line in data.splitlines(keepends=True):
+        stripped = line.rstrip(b"\r\n")
+        if fence_re.match(stripped):
+            in_fence = not in_fence
+        elif not in_fence:
+            if m := atx_heading_re.fullmatch(stripped):
+                headings.append((offset, m[1].decode(errors="replace")))
+            elif (
+                underline_re.fullmatch(stripped)
+                and len(stripped.strip()) >= 3
+                and prev is not None
+                and prev[1].strip()
+                and not underline_re.fullmatch(prev[1])
+            ):
+                start = prev[0]
+                # rst titles with an overline as well
+                if prev_prev is not None and prev_prev[1] == stripped:
+                    start = prev_prev[0]
+                headings.append((start, prev[1].strip().decode(errors="replace")))
+        prev_prev, prev = prev, (offset, stripped)
+        offset += len(line)
+    return headings
+
+
+def char_boundary(data: bytes, i: int) -> int:
+    """Move i back so it doesn't cut a utf-8 character in half."""
+    while i > 0 and data[i] & 0xC0 == 0x80:
+        i -= 1
+    return i
+
+
+def cut_points(
+    data: bytes, start: int, end: int, level: int, headings: list[int], max_bytes: int
+) -> list[int]:
+    """Where a range can be cut, from headings down to any character."""
+    match level:
+        case 0:
+            return [h for h in headings if start < h < end]
+        case 1:
+            return [m.end() for m in paragraph_re.finditer(data, start, end)]
+        case 2:
+            return [m.end() for m in newline_re.finditer(data, start, end)]
+        case _:
+            return [
+                char_boundary(data, i) for i in range(start + max_bytes, end, max_bytes)
+            ]
+
+
+def pack(
+    data: bytes, start: int, end: int, level: int, headings: list[int], max_bytes: int
+) -> list[tuple[int, int]]:
+    """
+    Greedily fill ranges of at most max_bytes with the pieces between cut points,
+    pieces that are too large on their own get split at the next level down.
+    """
+    ranges = []
+    cur = prev = start
+    for cut in cut_points(data, start, end, level, headings, max_bytes) + [end]:
+        if cut <= prev:
+            continue
+        if cut - cur > max_bytes:
+            if prev > cur:
+                ranges.append((cur, prev))
+                cur = prev
+            if cut - cur > max_bytes:
+                ranges += pack(data, cur, cut, level + 1, headings, max_bytes)
+                cur = cut
+        prev = cut
+    if end > cur:
+        ranges.append((cur, end))
+    return ranges
+
+
+def remove_shards(txt_p: Path, shards_dir: Path):
+    """Remove shards left over from an earlier build of txt_p."""
+    dest_dir = shards_dir / txt_p.name
+    if dest_dir.exists():
+        shutil.rmtree(dest_dir)
+
+
+def shard_file(txt_p: Path, shards_dir: Path, max_tokens: int) -> list[Path]:
+    """
+    Write the shards of txt_p and their manifest to shards_dir / txt_p.name if it's
+    over max_tokens, and give back the written files.
+    """
+    remove_shards(txt_p, shards_dir)
+    dest_dir = shards_dir / txt_p.name
+    data = txt_p.read_bytes()
+    max_bytes = max_tokens * BYTES_PER_TOKEN
+    if len(data) <= max_bytes:
+        return []
+
+    headings = find_headings(data)
+    heading_offsets = [h for h, _ in headings]
+    ranges = pack(data, 0, len(data), 0, heading_offsets, max_bytes)
+    dest_dir.mkdir(parents=True)
+    written = []
+    manifest = {"source": txt_p.name, "max_tokens": max_tokens, "shards": []}
+    for i, (start, end) in enumerate(ranges, start=1):
+        shard_p = dest_dir / f"{txt_p.stem}-{i:03d}{txt_p.suffix}"
+        shard_p.write_bytes(data[start:end])
+        written.append(shard_p)
+        first = bisect.bisect_left(heading_offsets, start)
+        last = bisect.bisect_left(heading_offsets, end)
+        manifest["shards"].append(
+            {
+                "file": shard_p.name,
+                "start": start,
+                "end": end,
+                "tokens": estimate_tokens(end - start),
+                "headings": [text for _, text in headings[first:last]],
+            }
+        )
+    manifest_p = dest_dir / "manifest.json"
+    manifest_p.write_text(json.dumps(manifest, indent=2))
+    written.append(manifest_p)
+    return written
@@ -0,0 +1,156 @@
+"""
+Upstream source code of github repos at a tag, for commands that collect docs out
+of it. By default that's the release tarball. With the cli --fetch-backend git
+option it's a blobless partial clone with a sparse checkout of only the paths the
+command collects, so for large repos like zed only the docs are downloaded. Clones
+are kept in scratchspace and later versions only fetch what's new, and every tag is
+checked out in a worktree of its own.
+"""
+
+import hashlib
+import re
+import subprocess
+import tarfile
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+
+from .cli import collect, collect_tgz, extract_tgz
+from .httpcache import rewritten
+
+clone_locks_lock = threading.Lock()
+clone_locks: defaultdict[str, threading.Lock] = defaultdict(threading.Lock)
+
+
+@dataclass
+class SourceTree:
+    """
+    Either a downloaded tarball or a checkout, and what the command collects from
+    it (see collect), which comes out the same from both.
+    """
+
+    pattern: str
+    root: str
+    exclude: str
+    tarball: Path | None = None
+    checkout: Path | None = None
+
+    def collect(self, dest: Path):
+        if self.checkout is not None:
+            # Which the tarball doesn't have
+            exclude = ",".join(e for e in [self.exclude, ".git/*"] if len(e) > 0)
+            collect(self.pattern, self.checkout / self.root, dest, exclude=exclude)
+        else:
+            assert self.tarball is not None
+            collect_tgz(
+                self.tarball, self.pattern, dest, exclude=self.exclude, root=self.root
+            )
+
+    def directory(self, scratchspace: Path) -> Path:
+        """The source as a directory, extracting the tarball into scratchspace."""
+        if self.checkout is not None:
+            return self.checkout
+        assert self.tarball is not None
+        with tarfile.open(self.tarball, mode="r|gz") as tar:
+            top = next(iter(tar)).name.split("/", 1)[0]
+        extract_tgz(self.tarball, scratchspace)
+        return scratchspace / top
+
+
+def sparse_patterns(pattern: str, root="") -> list[str]:
+    """
+    Sparse checkout (gitignore style) patterns covering what collect gets from
+    pattern under root, e.g. "/docs/" for root docs, "*.md" for "**.md".
+    """
+    if len(root) > 0:
+        return [f"/{root.strip('/')}/"]
+    patterns = []
+    for p in pattern.split(","):
+        p = p.strip()
+        if len(p) == 0:
+            continue
+        if "/" not in p:
+            # Matches at any depth like collect's do
+            patterns.append(p.replace("**", "*"))
+        else:
+            # The directory before the first wildcard
+            patterns.append(
+                "/" + re.split(r"[*?[]", p, maxsplit=1)[0].rsplit("/", 1)[0] + "/"
+            )
+    return patterns
+
+
+def git(*args: str, cwd: Path | None = None) -> str:
+    return subprocess.run(
+        ["git", *args], cwd=cwd, check=True, capture_output=True, text=True
+    ).stdout.strip()
+
+
+def tag_commit(clone_p: Path, tag: str) -> str | None:
+    try:
+        return git("rev-parse", "--verify", f"refs/tags/{tag}^{{commit}}", cwd=clone_p)
+    except subprocess.CalledProcessError:
+        return None
+
+
+def sparse_checkout(
+    clones_dir: Path, repo_url: str, tag: str, patterns: list[str]
+) -> tuple[Path, str]:
+    """
+    Check out only patterns of repo_url at tag with a clone kept in clones_dir, and
+    give back the checkout and the tag's commit. Blobs are fetched lazily, so only
+    the checked out files' are. Every tag gets a worktree of its own, so that
+    builds of several tags at once (e.g. under build-all) don't check out over the
+    files another is still collecting.
+    """
+    key = hashlib.sha256(repo_url.encode()).hexdigest()[:16]
+    clone_p = clones_dir / key
+    worktree_p = clones_dir / f"{key}-{re.sub(r'[^\w.-]', '_', tag)}"
+    with clone_locks_lock:
+        clone_lock = clone_locks[repo_url]
+    with clone_lock:
+        if not (clone_p / ".git").exists():
+            clones_dir.mkdir(parents=True, exist_ok=True)
+            git(
+                "clone",
+                "--quiet",
+                "--filter=blob:none",
+                "--no-checkout",
+                rewritten(repo_url),
+                str(clone_p),
+            )
+        commit = tag_commit(clone_p, tag)
+        if commit is None:
+            git("remote", "set-url", "origin", rewritten(repo_url), cwd=clone_p)
+            git("fetch", "--quiet", "--filter=blob:none", "--tags", cwd=clone_p)
+            commit = tag_commit(clone_p, tag)
+            if commit is None:
+                raise RuntimeError(f"{repo_url} has no tag {tag}")
+
+        # Configured by hand instead of with git sparse-checkout set, which would
+        # check out (and fetch the blobs of) the default branch first
+        git("config", "core.sparseCheckout", "true", cwd=clone_p)
+        git("config", "core.sparseCheckoutCone", "false", cwd=clone_p)
+        if not (worktree_p / ".git").exists():
+            # Forgets worktrees whose directory is gone
+            git("worktree", "prune", cwd=clone_p)
+            git(
+                "worktree",
+                "add",
+                "--quiet",
+                "--no-checkout",
+                "--detach",
+                str(worktree_p.absolute()),
+                commit,
+                cwd=clone_p,
+            )
+        # The worktree's own, under the clone's .git/worktrees
+        sparse_p = worktree_p / git(
+            "rev-parse", "--git-path", "info/sparse-checkout", cwd=worktree_p
+        )
+        sparse_p.parent.mkdir(exist_ok=True)
+        sparse_p.write_text("".join(f"{p}\n" for p in patterns))
+        git("checkout", "--quiet", "--force", "--detach", commit, cwd=worktree_p)
+        git("sparse-checkout", "reapply", cwd=worktree_p)
+    return worktree_p, commit
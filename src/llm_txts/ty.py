@@ -2,8 +2,8 @@ import logging
 
 import click
 
-from .cli import cli, collect, dl_tgz
-from .license_info import license_info
+from .builds import Build
+from .cli import cli
 
 
 @click.command()
@@ -18,20 +18,18 @@ def ty(ctx):
     )
 
     logging.info(f"Downloading ty {version} source code from github")
-    dl_tgz(
-        f"https://github.com/astral-sh/ty/archive/refs/tags/{version}.tar.gz",
-        scratchspace,
-    )
-    extracted_dest = scratchspace / f"ty-{version}"
-    logging.info(f"Wrote source code to {extracted_dest}")
+    build = Build(ctx, version)
+    source = build.fetch_source("astral-sh/ty", version, "**.md", root="docs")
+    if build.is_fresh():
+        return
 
     txts = ctx.obj["txts"]
     txt_dest = txts / f"ty-{version}.md"
     logging.info(f"Collecting ty md docs together and writing to {txt_dest}")
-    collect("**.md", extracted_dest / "docs", txt_dest)
+    source.collect(txt_dest)
+    build.done(txt_dest)
 
     logging.info(f"Done with ty {version}")
 
 
-license_info["ty"] = "MIT License"
 cli.add_command(ty)
@@ -1,12 +1,10 @@
 import logging
 
 import click
-import httpx
 
+from .builds import Build
 from .cli import cli
-from .license_info import license_info
-
-license_info["typst"] = "Apache 2.0 License"
+from .profiling import stage
 
 
 @click.command()
@@ -16,11 +14,15 @@ def typst(ctx):
         "Downloading typst 0.13.1 docs.md from github.com/abidsikder/typst-docs/single-file"  # noqa E501
     )
     download_url = "https://raw.githubusercontent.com/abidsikder/typst-docs-single-file/refs/heads/main/docs.md"
-    resp = httpx.get(download_url, follow_redirects=True)
+    build = Build(ctx, "0.13.1")
+    resp = build.fetch(download_url)
+    if build.is_fresh():
+        return
 
     txt_dest = ctx.obj["txts"] / "typst-0.13.1.md"
-    with txt_dest.open("w") as f:
-        f.write(resp.text)
+    with stage(ctx, "write"), txt_dest.open("w") as f:
+        f.write(resp.read_text())
+    build.done(txt_dest)
 
     logging.info("Done with typst")
 
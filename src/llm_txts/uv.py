@@ -2,8 +2,9 @@ import logging
 
 import click
 
-from .cli import cli, collect, dl_tgz, gh_latest_tag
-from .license_info import license_info
+from .builds import Build
+from .cli import cli
+from .versions import gh_latest_tag, latest_release_sources
 
 
 @click.command()
@@ -16,19 +17,21 @@ def uv(ctx):
     version = gh_latest_tag("astral-sh/uv")
 
     logging.info(f"Downloading uv {version} source code from github")
-    download_url = f"https://github.com/astral-sh/uv/archive/refs/tags/{version}.tar.gz"
-
-    dl_tgz(download_url, scratchspace)
-    extracted_dest = scratchspace / f"uv-{version}"
-    logging.info(f"Wrote source code to {extracted_dest}")
+    build = Build(ctx, version)
+    source = build.fetch_source(
+        "astral-sh/uv", version, "**.md", exclude="cli.md", root="docs"
+    )
+    if build.is_fresh():
+        return
 
     txts = ctx.obj["txts"]
     txt_dest = txts / f"uv-{version}.md"
     logging.info(f"Collecting uv md docs together and writing to {txt_dest}")
-    collect("**.md", extracted_dest / "docs", txt_dest, exclude="cli.md")
+    source.collect(txt_dest)
+    build.done(txt_dest)
 
     logging.info(f"Done with uv {version}")
 
 
-license_info["uv"] = "MIT License"
+latest_release_sources["uv"] = "astral-sh/uv"
 cli.add_command(uv)
@@ -0,0 +1,92 @@
+"""
+Resolves upstream versions: the latest github release tags and the devdocs
+catalog. Results are cached in scratchspace for ttl_seconds so that lookups aren't
+on the critical path of every command, and build-all resolves all of them
+concurrently up front.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+from . import workspace
+from .httpcache import client, fetch, host_slot, rewritten, write_atomic
+
+# How long a resolved version is reused for, set by the cli --version-ttl option
+ttl_seconds: int = 60 * 60
+
+# github ids (owner/repo) that commands look up the latest release of, keyed by
+# command name, so that build-all can resolve them all at once.
+latest_release_sources: dict[str, str] = dict()
+
+# Concurrent lookups of the same key wait on the first one instead of repeating it
+key_locks_lock = threading.Lock()
+key_locks: defaultdict[str, threading.Lock] = defaultdict(threading.Lock)
+
+
+def cache_dir() -> Path:
+    return workspace.scratchspace / "versions"
+
+
+def ttl_cached(key: str, resolve):
+    """
+    Return the cached result of resolve for key if it's younger than ttl_seconds,
+    otherwise call resolve and cache its (json serializable) result.
+    """
+    cache_dir().mkdir(parents=True, exist_ok=True)
+    cache_p = cache_dir() / f"{hashlib.sha256(key.encode()).hexdigest()}.json"
+    with key_locks_lock:
+        key_lock = key_locks[key]
+    with key_lock:
+        if cache_p.exists():
+            cached = json.loads(cache_p.read_text())
+            if cached["key"] == key and time.time() - cached["at"] < ttl_seconds:
+                return cached["value"]
+        value = resolve()
+        cached = {"key": key, "at": time.time(), "value": value}
+        write_atomic(cache_p, lambda f: f.write(json.dumps(cached).encode()))
+        return value
+
+
+def gh_latest_tag(gh_id: str) -> str:
+    """Give the github url without a forward slash at the end"""
+
+    def resolve():
+        url = rewritten(f"https://github.com/{gh_id}/releases/latest")
+        with host_slot(url):
+            resp = client().get(url)
+        redirect_url = resp.headers["Location"]
+        latest_tag = redirect_url.rsplit("/", 1)[-1]
+        if latest_tag[0] == "v":
+            latest_tag = latest_tag[1:]
+        return latest_tag
+
+    return ttl_cached(f"gh-latest-tag:{gh_id}", resolve)
+
+
+def devdocs_catalog() -> list[dict]:
+    """The devdocs.io list of every documentation set, shared by all devdocs sets."""
+    return ttl_cached(
+        "devdocs-catalog",
+        lambda: json.loads(fetch("https://devdocs.io/docs/docs.json").read_text()),
+    )
+
+
+def resolve_all(jobs: int):
+    """Concurrently resolve every registered source so later lookups hit the cache."""
+    gh_ids = sorted(set(latest_release_sources.values()))
+    logging.info(f"Resolving versions of {len(gh_ids)} sources and the devdocs catalog")
+    with ThreadPoolExecutor(jobs) as pool:
+        futures: list[Future] = [pool.submit(devdocs_catalog)]
+        futures += [pool.submit(gh_latest_tag, gh_id) for gh_id in gh_ids]
+        for future in futures:
+            try:
+                future.result()
+            except Exception:
+                # The command that needs it will try again and report the failure
+                logging.exception("Failed resolving a version up front")
@@ -1,13 +1,23 @@
 import logging
-import threading
+from pathlib import Path
 
 import click
-from bs4 import BeautifulSoup
 
-from .cli import cli, dl_zip_curl, gh_latest_tag
-from .license_info import license_info
+from .builds import Build
+from .cleanup import Rule, Rules, clean_html_blocks
+from .cli import cli, concurrently, extract_zip, run_cpu, write_markdown
+from .httpcache import fetch_curl
+from .versions import gh_latest_tag, latest_release_sources
 
-license_info["whenever"] = "MIT License"
+rules = Rules([Rule("section#changelog")])
+
+
+def convert(index_html_p: Path, txt_dest: Path):
+    main_content = clean_html_blocks(
+        index_html_p.read_text(), rules, content="article#furo-main-content"
+    )
+    with txt_dest.open(mode="w") as f:
+        write_markdown(main_content, f)
 
 
 @click.command
@@ -16,46 +26,30 @@ def whenever(ctx):
     scratchspace = ctx.obj["scratchspace"] / "whenever"
     scratchspace.mkdir(exist_ok=True)
 
-    version = None
-
-    def get_version():
-        nonlocal version
-        logging.info("Determining the latest version specifier")
-        version = gh_latest_tag("ariebovenberg/whenever")
-
-    converted: str = ""
-
-    def process_downloaded_html():
-        logging.info("Downloading the latest version html pages from readthedocs")
+    logging.info(
+        "Determining the latest version specifier and downloading the latest version html pages from readthedocs"  # noqa: E501
+    )
+    version, zip_resp = concurrently(
+        lambda: gh_latest_tag("ariebovenberg/whenever"),
         # Use curl because httpx seems to be blocked by readthedocs
-        dl_zip_curl(
-            "https://whenever.readthedocs.io/_/downloads/en/latest/htmlzip/",
-            scratchspace / "whenever-latest.zip",
-        )
-        extracted = scratchspace / "whenever-latest"
-        logging.info("Converting the downloaded html to markdown")
-        soup = BeautifulSoup((extracted / "index.html").read_text(), "lxml")
-        main_content = list(soup.find_all("article", id="furo-main-content"))[0]
-        for elem in main_content.find_all("section", id="changelog"):
-            elem.decompose()
-        text_maker = ctx.obj["text_maker"]
-        nonlocal converted
-        converted = text_maker.handle(str(main_content))
-
-    version_thread = threading.Thread(target=get_version)
-    html_thread = threading.Thread(target=process_downloaded_html)
-
-    version_thread.start()
-    html_thread.start()
-
-    version_thread.join()
-    html_thread.join()
-
+        lambda: fetch_curl(
+            "https://whenever.readthedocs.io/_/downloads/en/latest/htmlzip/"
+        ),
+    )
+    build = Build(ctx, version)
+    build.add_input(zip_resp)
+    if build.is_fresh():
+        return
+
+    extract_zip(zip_resp.path, scratchspace)
+    extracted = scratchspace / "whenever-latest"
+    logging.info("Converting the downloaded html to markdown")
     txt_dest = ctx.obj["txts"] / f"whenever-{version}.md"
-    with txt_dest.open(mode="w") as f:
-        f.write(converted)
+    run_cpu(ctx, convert, extracted / "index.html", txt_dest)
+    build.done(txt_dest)
 
     logging.info(f"Done processing whenever {version}")
 
 
+latest_release_sources["whenever"] = "ariebovenberg/whenever"
 cli.add_command(whenever)
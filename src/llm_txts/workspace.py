@@ -0,0 +1,11 @@
+"""
+Where the working files of a run go. The cli group points scratchspace at its
+ctx.obj["scratchspace"] before any command runs. Code that's handed ctx uses
+ctx.obj["scratchspace"] directly. The blob store and the http and version caches
+read it from here instead, since they're used from threads and helpers that have
+no click context.
+"""
+
+from pathlib import Path
+
+scratchspace = Path("scratchspace")
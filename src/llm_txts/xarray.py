@@ -1,13 +1,27 @@
 import logging
-import subprocess
+from pathlib import Path
 
 import click
-from bs4 import BeautifulSoup
 
-from .cli import cli, collect, common_soup_clean, dl_tgz, gh_latest_tag
-from .license_info import license_info
+from .builds import Build
+from .cleanup import Rules, clean_html_blocks, common_rules
+from .cli import (
+    build_all_variants,
+    cli,
+    concurrently,
+    run_cpu,
+    write_markdown,
+)
+from .versions import gh_latest_tag, latest_release_sources
 
-license_info["xarray"] = "Apache License 2.0"
+rules = Rules(common_rules)
+
+
+def convert(api_html_p: Path, encoding: str, txt_dest: Path):
+    api_html = api_html_p.read_bytes().decode(encoding, errors="replace")
+    cleaned = clean_html_blocks(api_html, rules, content="article.bd-article")
+    with txt_dest.open(mode="a") as f:
+        write_markdown(cleaned, f)
 
 
 @click.command
@@ -21,40 +35,36 @@ def xarray(ctx, version: str | None):
         logging.info("Finding latest version of xarray since none was specified")
         version = gh_latest_tag("pydata/xarray")
 
-    logging.info(f"Downloading xarray {version} source from github")
-    dl_tgz(
-        f"https://github.com/pydata/xarray/archive/refs/tags/v{version}.tar.gz",
-        scratchspace,
+    tag = f"v{version}"
+    api_url = f"https://docs.xarray.dev/en/v{version}/api.html"
+    build = Build(ctx, version)
+    source, api_resp = concurrently(
+        lambda: build.fetch_source(
+            "pydata/xarray",
+            tag,
+            "user-guide/**.rst,getting-started-guide/**.rst,get-help/**.rst",
+            root="doc",
+        ),
+        lambda: build.fetch_curl(api_url),
     )
-    extracted = scratchspace / f"xarray-{version}"
+    if build.is_fresh():
+        return
 
     txt_dest = ctx.obj["txts"] / f"xarray-{version}.txt"
-    logging.info(f"Collating rst files into initial txt at {txt_dest}")
-    collect(
-        "user-guide/**.rst,getting-started-guide/**.rst,get-help/**.rst",
-        extracted / "doc",
-        txt_dest,
+    logging.info(
+        f"Collating rst files from xarray {version} source into initial txt at {txt_dest}"  # noqa: E501
     )
+    source.collect(txt_dest)
 
     logging.info(
         "Grabbing xarray's detailed api documentation and adding it to the txt"
     )
-    curl_resp = subprocess.run(
-        ["curl", "-L", f"https://docs.xarray.dev/en/v{version}/api.html"],
-        check=True,
-        capture_output=True,
-    )
-    soup = BeautifulSoup(curl_resp.stdout.decode(), "lxml")
-    soup = BeautifulSoup(
-        str(list(soup.find_all("article", class_="bd-article"))[0]), "lxml"
-    )
-    common_soup_clean(soup)
-    text_maker = ctx.obj["text_maker"]
-    converted = text_maker.handle(str(soup))
-    with txt_dest.open(mode="a") as f:
-        f.write(converted)
+    run_cpu(ctx, convert, api_resp.path, api_resp.encoding, txt_dest)
+    build.done(txt_dest)
 
     logging.info(f"Done processing xarray {version}")
 
 
+build_all_variants["xarray"] = [["--version", "2025.07.1"]]
+latest_release_sources["xarray"] = "pydata/xarray"
 cli.add_command(xarray)
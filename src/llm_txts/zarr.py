@@ -1,11 +1,23 @@
 import logging
+from pathlib import Path
 
 import click
 
-from .cli import cli, collect, dl_tgz, dl_zip_curl, gh_latest_tag
-from .license_info import license_info
+from .builds import Build
+from .cli import (
+    cli,
+    concurrently,
+    extract_zip,
+    html_chunks,
+    run_cpu,
+    write_markdown,
+)
+from .versions import gh_latest_tag, latest_release_sources
 
-license_info["zarr"] = "MIT License"
+
+def convert(index_html_p: Path, txt_dest: Path):
+    with index_html_p.open() as html_f, txt_dest.open(mode="a") as f:
+        write_markdown(html_chunks(html_f), f)
 
 
 @click.command
@@ -19,34 +31,34 @@ def zarr(ctx, version: str | None):
         logging.info("Finding latest version of zarr since none was specified")
         version = gh_latest_tag("zarr-developers/zarr-python")
 
-    logging.info(f"Downloading zarr {version} source from github")
-    dl_tgz(
-        f"https://github.com/zarr-developers/zarr/archive/refs/tags/v{version}.tar.gz",
-        scratchspace,
+    tag = f"v{version}"
+    api_url = f"https://zarr.readthedocs.io/_/downloads/en/v{version}/htmlzip/"
+    build = Build(ctx, version)
+    logging.info(f"Downloading zarr {version} source and detailed api documentation")
+    source, api_resp = concurrently(
+        lambda: build.fetch_source(
+            "zarr-developers/zarr", tag, "**.rst", root="docs/user-guide"
+        ),
+        # Use curl because httpx seems to be blocked by readthedocs
+        lambda: build.fetch_curl(api_url),
     )
-    extracted = scratchspace / f"zarr-python-{version}"
+    if build.is_fresh():
+        return
+
     txt_dest = ctx.obj["txts"] / f"zarr-{version}.md"
-    logging.info(f"Collating user guide files into initial txt at {txt_dest}")
-    txt_dest.write_text("a")
-    collect(
-        "**.rst",
-        extracted / "docs" / "user-guide",
-        txt_dest,
+    logging.info(
+        f"Collating zarr {version} user guide files into initial txt at {txt_dest}"
     )
+    source.collect(txt_dest)
 
-    logging.info(f"Downloading and adding zarr {version} detailed api documentation")
-    dl_zip_curl(
-        f"https://zarr.readthedocs.io/_/downloads/en/v{version}/htmlzip/",
-        scratchspace / f"zarr-v{version}.zip",
-    )
+    logging.info(f"Adding zarr {version} detailed api documentation")
+    extract_zip(api_resp.path, scratchspace)
     extracted = scratchspace / f"zarr-v{version}"
     index_html_p = extracted / "index.html"
-    index_html = index_html_p.read_text()
-    text_maker = ctx.obj["text_maker"]
-    converted = text_maker.handle(index_html)
-    with txt_dest.open("a") as f:
-        f.write(converted)
+    run_cpu(ctx, convert, index_html_p, txt_dest)
+    build.done(txt_dest)
     logging.info(f"Done with zarr {version}")
 
 
+latest_release_sources["zarr"] = "zarr-developers/zarr-python"
 cli.add_command(zarr)
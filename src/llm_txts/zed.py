@@ -2,10 +2,9 @@ import logging
 
 import click
 
-from .cli import cli, collect, dl_tgz, gh_latest_tag
-from .license_info import license_info
-
-license_info["zed"] = "GNU AGPLv3"
+from .builds import Build
+from .cli import cli
+from .versions import gh_latest_tag, latest_release_sources
 
 
 @click.command
@@ -20,19 +19,19 @@ def zed(ctx, version: str | None):
         version = gh_latest_tag("zed-industries/zed")
 
     logging.info(f"Downloading zed {version} source code from github")
-    download_url = (
-        f"https://github.com/zed-industries/zed/archive/refs/tags/v{version}.tar.gz"
-    )
-    dl_tgz(download_url, scratchspace)
-    extracted_dest = scratchspace / f"zed-{version}"
-    logging.info(f"Wrote source code to {extracted_dest}")
+    build = Build(ctx, version)
+    source = build.fetch_source("zed-industries/zed", f"v{version}", "**.md")
+    if build.is_fresh():
+        return
 
     txts = ctx.obj["txts"]
     txt_dest = txts / f"zed-{version}.md"
     logging.info(f"Collecting zed md docs together and writing to {txt_dest}")
-    collect("**.md", extracted_dest, txt_dest)
+    source.collect(txt_dest)
+    build.done(txt_dest)
 
     logging.info(f"Done with zed {version}")
 
 
+latest_release_sources["zed"] = "zed-industries/zed"
 cli.add_command(zed)
@@ -1,14 +1,32 @@
 import logging
 import re
+from pathlib import Path
 
 import click
-import httpx
-from bs4 import BeautifulSoup
 
-from .cli import cli, common_soup_clean
-from .license_info import license_info
+from .builds import Build
+from .cleanup import Rule, Rules, clean_html_blocks, common_rules
+from .cli import build_all_variants, build_versions, cli, run_cpu, write_markdown
 
-license_info["zig"] = "MIT License"
+rules = Rules([Rule("div#navigation")], common_rules)
+
+
+def convert(html_p: Path, encoding: str, txt_dest: Path):
+    webpage_html = html_p.read_bytes().decode(encoding, errors="replace")
+    cleaned_html = clean_html_blocks(webpage_html, rules)
+    with txt_dest.open(mode="w") as f:
+        write_markdown(cleaned_html, f)
+
+
+def master_version(txt_p: Path) -> str:
+    """The version master's language reference says it's for."""
+    pattern = re.compile(r'zig_version_string = "([^"]*)"')
+    with txt_p.open() as f:
+        for line in f:
+            match = pattern.search(line)
+            if match is not None:
+                return match.group(1)
+    raise click.ClickException(f"No zig_version_string in {txt_p}")
 
 
 @click.group
@@ -20,41 +38,33 @@ def zig(ctx):
 
 @click.command(name="lang_ref")
 @click.pass_context
-@click.argument("version", type=str)
-def zig_lang_ref(ctx, version: str):
+@click.argument("versions", nargs=-1, required=True)
+def zig_lang_ref(ctx, versions: tuple[str, ...]):
     """
-    Compile language reference. Only caches non-master branch versions on local disk
+    Compile language reference of each of versions, e.g. 0.15.2 master.
     """
-    scratchspace = ctx.obj["scratchspace"] / "zig"
-    webpage_cache_name = f"zig_language_reference-{version}.html"
-    webpage_cached = scratchspace / webpage_cache_name
-    if not webpage_cached.exists() or version == "master":
-        webpage_html = httpx.get(
-            f"https://ziglang.org/documentation/{version}/", follow_redirects=True
-        ).text
-        webpage_cached.write_text(webpage_html)
-    else:
-        webpage_html = webpage_cached.read_text()
-    soup = BeautifulSoup(webpage_html, "lxml")
-
-    for elem in soup.find_all("div", id="navigation"):
-        elem.decompose()
-    common_soup_clean(soup)
-    cleaned_html = str(soup)
-
-    text_maker = ctx.obj["text_maker"]
-    converted = text_maker.handle(cleaned_html)
-    if version == "master":
-        pattern = r'zig_version_string = "([^"]*)"'
-        match = re.search(pattern, converted)
-        version = match.group(1)
+    build_versions(ctx, "version", versions, build_lang_ref)
+
+
+def build_lang_ref(ctx, version: str):
+    build = Build(ctx, version)
+    resp = build.fetch(f"https://ziglang.org/documentation/{version}/")
+    if build.is_fresh():
+        return
 
     txts = ctx.obj["txts"]
     txt_dest = txts / f"zig-language-ref-{version}.md"
-    txt_dest.write_text(converted)
+    run_cpu(ctx, convert, resp.path, resp.encoding, txt_dest)
+    if version == "master":
+        # Named after the actual version once it's known
+        version = master_version(txt_dest)
+        build.release = version
+        txt_dest = txt_dest.replace(txts / f"zig-language-ref-{version}.md")
+    build.done(txt_dest)
 
     logging.info(f"Done with zig language reference {version}")
 
 
 zig.add_command(zig_lang_ref)
+build_all_variants["zig"] = [["lang_ref", "0.15.2", "master"]]
 cli.add_command(zig)
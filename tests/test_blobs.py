@@ -0,0 +1,37 @@
+import json
+import os
+
+from llm_txts import blobs, builds, httpcache, workspace
+
+
+def test_collect_garbage_keeps_referenced_and_linked_blobs(tmp_path, monkeypatch):
+    scratchspace = tmp_path / "scratchspace"
+    monkeypatch.setattr(workspace, "scratchspace", scratchspace)
+    cached = blobs.put_chunks([b"an http cache body"])
+    built = blobs.put_chunks([b"a build manifest input"])
+    linked = blobs.put_chunks([b"a materialized output"])
+    orphan = blobs.put_chunks([b"nothing uses this anymore"])
+    os.link(blobs.blob_path(linked), tmp_path / "out.txt")
+    # A temp file left by an interrupted put_chunks
+    (blobs.blobs_dir() / "tmpabc").write_bytes(b"partial")
+
+    httpcache.cache_dir().mkdir(parents=True)
+    (httpcache.cache_dir() / "a.json").write_text(
+        json.dumps({"url": "https://example.com/a", "sha256": cached})
+    )
+    (httpcache.cache_dir() / "b.part.json").write_text(json.dumps({"sha256": orphan}))
+    builds.manifest_dir(scratchspace).mkdir(parents=True)
+    (builds.manifest_dir(scratchspace) / "b.json").write_text(
+        json.dumps({"inputs": {"https://example.com/b": built}})
+    )
+
+    keep = httpcache.cached_sha256s() | builds.input_sha256s(scratchspace)
+    removed, freed = blobs.collect_garbage(keep)
+
+    assert (removed, freed) == (1, len(b"nothing uses this anymore"))
+    for sha256 in [cached, built, linked]:
+        assert blobs.blob_path(sha256).exists()
+    assert not blobs.blob_path(orphan).exists()
+    assert not blobs.blob_path(orphan).parent.exists()
+    assert not (blobs.blobs_dir() / "tmpabc").exists()
+    assert (tmp_path / "out.txt").read_bytes() == b"a materialized output"
@@ -0,0 +1,26 @@
+import click
+
+from llm_txts import history
+from llm_txts.builds import Build
+from llm_txts.profiling import pool_usage
+
+
+@click.command
+def docs():
+    pass
+
+
+def test_build_under_build_all_records_its_pool_peak_rss(tmp_path):
+    scratchspace = tmp_path / "scratchspace"
+    # Stands in for build-all's process pool, which only pool_usage is fed by
+    obj = {"scratchspace": scratchspace, "shards": tmp_path / "shards"}
+    obj["cpu_pool"] = object()
+    parent = click.Context(click.Group("lt"), info_name="lt", obj=obj)
+    ctx = click.Context(docs, info_name="docs", parent=parent)
+    pool_usage(ctx).max_rss_bytes = 1234
+
+    Build(ctx, "1").record("1", [])
+
+    with history.connect(scratchspace) as db:
+        rows = db.execute("select name, peak_rss_bytes from builds").fetchall()
+    assert [tuple(row) for row in rows] == [("docs", 1234)]
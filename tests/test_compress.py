@@ -0,0 +1,49 @@
+import gzip
+import os
+
+import brotli
+import zstandard
+
+from llm_txts.compress import compress_file, remove_orphans
+
+
+def test_compress_file_writes_every_sibling(tmp_path):
+    txt_p = tmp_path / "python-3.13.5.txt"
+    data = b"# Heading\n\nSome text that repeats. " * 200
+    txt_p.write_bytes(data)
+
+    sizes = compress_file(txt_p)
+
+    assert set(sizes) == {".gz", ".br", ".zst"}
+    gz_p = tmp_path / "python-3.13.5.txt.gz"
+    br_p = tmp_path / "python-3.13.5.txt.br"
+    zst_p = tmp_path / "python-3.13.5.txt.zst"
+    assert gzip.decompress(gz_p.read_bytes()) == data
+    assert brotli.decompress(br_p.read_bytes()) == data
+    assert zstandard.ZstdDecompressor().decompress(zst_p.read_bytes()) == data
+    for suffix, p in [(".gz", gz_p), (".br", br_p), (".zst", zst_p)]:
+        assert sizes[suffix] == p.stat().st_size < len(data)
+        assert p.stat().st_mtime_ns == txt_p.stat().st_mtime_ns
+
+
+def test_compress_file_skips_up_to_date_siblings(tmp_path):
+    txt_p = tmp_path / "a.txt"
+    txt_p.write_bytes(b"hello " * 100)
+    compress_file(txt_p)
+    br_p = tmp_path / "a.txt.br"
+    br_p.write_bytes(b"left alone")
+    os.utime(br_p, ns=(txt_p.stat().st_atime_ns, txt_p.stat().st_mtime_ns))
+
+    assert compress_file(txt_p)[".br"] == len(b"left alone")
+    assert br_p.read_bytes() == b"left alone"
+
+
+def test_remove_orphans(tmp_path):
+    txt_p = tmp_path / "a.txt"
+    txt_p.write_bytes(b"hello " * 100)
+    compress_file(txt_p)
+    txt_p.unlink()
+
+    remove_orphans(tmp_path)
+
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,25 @@
+from llm_txts.dedupe import Index, dedupe_text
+
+PROSE = (
+    "This paragraph is repeated in every section of the generated docs, word for word."
+)
+SNIPPET = """```python
+# Configure the client once and share it between all of the requests that follow it
+
+client = make_client(timeout=30, retries=5, follow_redirects=True, http2=True)
+```"""
+
+
+def test_repeated_fenced_block_with_blank_line_is_kept():
+    text = f"{SNIPPET}\n\n{PROSE}\n\n{SNIPPET}\n\n{PROSE}\n\nThe end.\n"
+    deduped = dedupe_text(text, Index())
+    assert deduped.count("```") == 4
+    assert deduped.count(SNIPPET) == 2
+    # Prose outside the fences is still deduped
+    assert deduped.count(PROSE) == 1
+
+
+def test_block_inside_fence_is_kept():
+    inner = "a line of code that is long enough to count as a repeated paragraph here"
+    text = f"{inner}\n\n~~~\nstart\n\n{inner}\n\nend\n~~~\n"
+    assert dedupe_text(text, Index()) == text
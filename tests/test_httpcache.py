@@ -0,0 +1,193 @@
+import gzip
+import json
+import random
+import re
+import subprocess
+import threading
+from collections import defaultdict
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from llm_txts import httpcache, workspace
+
+BODY = b"the whole body of the new version of the file\n" * 100
+
+
+class MisalignedRangeHandler(BaseHTTPRequestHandler):
+    """Answers Range requests with a 206 that starts somewhere else."""
+
+    def do_GET(self):
+        if "Range" in self.headers:
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes 3-{len(BODY) - 1}/{len(BODY)}")
+            body = BODY[3:]
+        else:
+            self.send_response(200)
+            body = BODY
+        self.send_header("ETag", '"v2"')
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# Big enough that the first attempt writes some of it to the part before the drop
+GZIP_BODY = random.Random(0).randbytes(4 * 1024 * 1024)
+GZIP_ENCODED = gzip.compress(GZIP_BODY)
+
+
+class GzipDroppingHandler(BaseHTTPRequestHandler):
+    """
+    Serves GZIP_BODY gzip encoded, with ranges of the encoded bytes like real
+    servers, and drops the connection halfway through the first response.
+    """
+
+    requests: list[dict[str, str]] = []
+
+    def do_GET(self):
+        self.requests.append(dict(self.headers))
+        m = re.match(r"bytes=(\d+)-", self.headers.get("Range", ""))
+        if m is not None and self.headers.get("If-Range") == '"v1"':
+            start = int(m[1])
+            self.send_response(206)
+            self.send_header(
+                "Content-Range",
+                f"bytes {start}-{len(GZIP_ENCODED) - 1}/{len(GZIP_ENCODED)}",
+            )
+        else:
+            start = 0
+            self.send_response(200)
+        body = GZIP_ENCODED[start:]
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if len(self.requests) == 1:
+            self.wfile.write(body[: len(body) // 2])
+            self.close_connection = True
+        else:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class DroppingRangeHandler(BaseHTTPRequestHandler):
+    """Serves BODY with ranges, and drops the connection halfway through the first
+    response."""
+
+    requests: list[dict[str, str]] = []
+
+    def do_GET(self):
+        self.requests.append(dict(self.headers))
+        m = re.match(r"bytes=(\d+)-", self.headers.get("Range", ""))
+        if m is not None and self.headers.get("If-Range") == '"v1"':
+            start = int(m[1])
+            self.send_response(206)
+            self.send_header(
+                "Content-Range", f"bytes {start}-{len(BODY) - 1}/{len(BODY)}"
+            )
+        else:
+            start = 0
+            self.send_response(200)
+        body = BODY[start:]
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if len(self.requests) == 1:
+            self.wfile.write(body[: len(body) // 2])
+            self.close_connection = True
+        else:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(handler) -> Iterator[str]:
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}/file.txt"
+    httpd.shutdown()
+    httpcache.close_client()
+
+
+@pytest.fixture
+def server():
+    yield from serve(MisalignedRangeHandler)
+
+
+@pytest.fixture
+def dropping_server():
+    DroppingRangeHandler.requests = []
+    yield from serve(DroppingRangeHandler)
+
+
+@pytest.fixture
+def gzip_server():
+    GzipDroppingHandler.requests = []
+    yield from serve(GzipDroppingHandler)
+
+
+def test_misaligned_resume_starts_over_without_holding_the_host_slot(
+    server, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(workspace, "scratchspace", tmp_path / "scratchspace")
+    monkeypatch.setattr(
+        httpcache, "host_slots", defaultdict(lambda: threading.BoundedSemaphore(1))
+    )
+    httpcache.cache_dir().mkdir(parents=True)
+    part_p, part_meta_p = httpcache.part_paths(server)
+    part_p.write_bytes(b"old part")
+    part_meta_p.write_text(
+        json.dumps(
+            {"url": server, "etag": '"v1"', "encoding": "utf-8", "encoded": False}
+        )
+    )
+
+    result = []
+    thread = threading.Thread(
+        target=lambda: result.append(httpcache.fetch(server)), daemon=True
+    )
+    thread.start()
+    thread.join(timeout=10)
+
+    assert not thread.is_alive(), "retry deadlocked on the host slot"
+    assert result[0].read_bytes() == BODY
+    assert not part_p.exists()
+
+
+def test_gzip_encoded_download_starts_over_instead_of_resuming(
+    gzip_server, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(workspace, "scratchspace", tmp_path / "scratchspace")
+    monkeypatch.setattr(httpcache, "BACKOFF_SECONDS", 0.0)
+
+    resp = httpcache.fetch(gzip_server)
+
+    assert resp.read_bytes() == GZIP_BODY
+    assert len(GzipDroppingHandler.requests) == 2
+    assert "Range" not in GzipDroppingHandler.requests[1]
+    assert not httpcache.part_paths(gzip_server)[0].exists()
+
+
+def test_curl_download_resumes_the_part(dropping_server, tmp_path, monkeypatch):
+    monkeypatch.setattr(workspace, "scratchspace", tmp_path / "scratchspace")
+
+    with pytest.raises(subprocess.CalledProcessError):
+        httpcache.fetch_curl(dropping_server)
+    part_p, _ = httpcache.part_paths(dropping_server)
+    resume_from = part_p.stat().st_size
+    assert 0 < resume_from < len(BODY)
+
+    resp = httpcache.fetch_curl(dropping_server)
+
+    assert resp.read_bytes() == BODY
+    assert resp.downloaded_bytes == len(BODY) - resume_from
+    assert DroppingRangeHandler.requests[1]["Range"] == f"bytes={resume_from}-"
+    assert not part_p.exists()
@@ -0,0 +1,102 @@
+import click
+import pytest
+
+from llm_txts import httpcache, workspace
+from llm_txts.builds import Build
+from llm_txts.sources import git
+
+FILES = {
+    "README.md": "# repo\n",
+    "docs/index.md": "# Docs at {tag}\n",
+    "docs/guide/usage.md": "# Usage\n",
+    "src/main.py": "print('not docs')\n",
+}
+
+
+@pytest.fixture
+def remote(tmp_path, monkeypatch):
+    """A bare repo at owner/repo.git, with tags v1 and v2, that github.com urls go
+    to."""
+    work_p = tmp_path / "work"
+    work_p.mkdir()
+    git("init", "--quiet", cwd=work_p)
+    for tag in ["v1", "v2"]:
+        for name, text in FILES.items():
+            p = work_p / name
+            p.parent.mkdir(parents=True, exist_ok=True)
+            p.write_text(text.format(tag=tag))
+        git("add", ".", cwd=work_p)
+        git(
+            "-c",
+            "user.name=test",
+            "-c",
+            "user.email=test@example.com",
+            "commit",
+            "--quiet",
+            "-m",
+            tag,
+            cwd=work_p,
+        )
+        git("tag", tag, cwd=work_p)
+    remote_p = tmp_path / "remote" / "owner" / "repo.git"
+    git("clone", "--quiet", "--bare", str(work_p), str(remote_p))
+    # So that the clone can be blobless
+    git("config", "uploadpack.allowFilter", "true", cwd=remote_p)
+    monkeypatch.setitem(
+        httpcache.url_rewrites,
+        "https://github.com/",
+        f"file://{tmp_path / 'remote'}/",
+    )
+    return remote_p
+
+
+@click.command
+def docs():
+    pass
+
+
+def make_build(tmp_path, monkeypatch, version: str) -> Build:
+    scratchspace = tmp_path / "scratchspace"
+    monkeypatch.setattr(workspace, "scratchspace", scratchspace)
+    obj = {"scratchspace": scratchspace, "fetch_backend": "git"}
+    parent = click.Context(click.Group("lt"), info_name="lt", obj=obj)
+    return Build(click.Context(docs, info_name="docs", parent=parent), version)
+
+
+def checked_out(checkout) -> set[str]:
+    return {
+        str(p.relative_to(checkout))
+        for p in checkout.rglob("*")
+        if p.is_file() and ".git" not in p.relative_to(checkout).parts
+    }
+
+
+def test_git_backend_checks_out_only_the_sparse_paths_at_the_tag(
+    remote, tmp_path, monkeypatch
+):
+    build = make_build(tmp_path, monkeypatch, "1")
+
+    source = build.fetch_source("owner/repo", "v1", "**.md", root="docs")
+
+    assert source.checkout is not None
+    assert checked_out(source.checkout) == {"docs/index.md", "docs/guide/usage.md"}
+    commit = git("rev-parse", "v1^{commit}", cwd=remote)
+    assert build.inputs == {"https://github.com/owner/repo.git#v1": commit}
+    txt_p = tmp_path / "docs.txt"
+    source.collect(txt_p)
+    assert "# Docs at v1" in txt_p.read_text()
+    assert "not docs" not in txt_p.read_text()
+
+
+def test_git_backend_tags_have_their_own_checkouts(remote, tmp_path, monkeypatch):
+    v1 = make_build(tmp_path, monkeypatch, "1").fetch_source(
+        "owner/repo", "v1", "**.md", root="docs"
+    )
+    v2 = make_build(tmp_path, monkeypatch, "2").fetch_source(
+        "owner/repo", "v2", "**.md", root="docs"
+    )
+
+    assert v1.checkout != v2.checkout
+    assert v1.checkout is not None and v2.checkout is not None
+    assert (v1.checkout / "docs/index.md").read_text() == "# Docs at v1\n"
+    assert (v2.checkout / "docs/index.md").read_text() == "# Docs at v2\n"